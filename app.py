@@ -1,30 +1,56 @@
 # app.py
+import contextvars
+import hmac
 import os
 import mimetypes
 import threading
 import time
+import uuid
 from flask import (
-    current_app,
     jsonify,
     render_template,
     request,
     send_file,
     send_from_directory,
+    url_for,
     Flask,
 )
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from pdf_processor import extract_text_from_pdf
-from text_preprocessor import preprocess_text
-from logging_config import logger
+from pdf_processor import inspect_pdf, estimate_job_cost
+from text_preprocessor import hashed_term_frequencies
+from logging_config import logger, log_buffer, job_context, set_log_stage
+from scheduler import JobScheduler
+from progress_model import ThroughputModel, JobProgress, poll_interval
+from pipeline import (
+    extract_document,
+    preprocess_document,
+    save_document,
+    blob_digest,
+    processed_filename_for,
+)
+from similarity import SimilarityIndex
+from profiling import JobProfiler, run_profiled, load_profile_report
+from blob_index import BlobIndex
+from stage_executors import StageExecutors
+from checkpoints import JobCheckpoint, unfinished_jobs
+from job_queue import open_job_queue
 from config import (
     FILE_TO_PROCESS_FOLDER,
     PROCESSED_FILE_FOLDER,
     MAX_CONTENT_LENGTH,
     PROCESSING_TIMEOUT,
+    CHECKPOINTS,
+    UPLOAD_CHUNK_SIZE,
+    NEAR_DUPLICATE_DETECTION,
+    FEATURE_VECTORS,
+    ADMIN_TOKEN,
+    PROFILE_FOLDER,
 )
 from text_preprocessor import download_nltk_resources
 
-
 app = Flask(__name__)
 
 logger.info("Starting PDF processing server")
@@ -37,6 +63,8 @@ app.config["FILE_TO_PROCESS_FOLDER"] = FILE_TO_PROCESS_FOLDER
 app.config["PROCESSED_FILE_FOLDER"] = PROCESSED_FILE_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
 app.config["PROCESSING_TIMEOUT"] = PROCESSING_TIMEOUT
+os.makedirs(FILE_TO_PROCESS_FOLDER, exist_ok=True)
+os.makedirs(PROCESSED_FILE_FOLDER, exist_ok=True)
 
 
 def calculate_processing_time(start_time):
@@ -47,6 +75,25 @@ def calculate_processing_time(start_time):
 # Global dictionary to store processing status
 processing_status = {}
 
+# Runs processing jobs on a bounded pool, ordered by estimated cost
+job_scheduler = JobScheduler()
+
+# Shared queue consumed by standalone workers (worker.py), if configured;
+# otherwise jobs run on this process's scheduler
+job_queue = open_job_queue()
+
+# Content digests of stored uploads, for clients skipping duplicate uploads
+blob_index = BlobIndex()
+
+# MinHash/LSH index of processed documents, for near-duplicate detection
+similarity_index = SimilarityIndex() if NEAR_DUPLICATE_DETECTION else None
+
+# Process/thread pools the stages of processing jobs run on
+stage_executors = StageExecutors()
+
+# Per-stage throughput learned from completed jobs, for progress and ETA
+throughput_model = ThroughputModel()
+
 
 @app.route("/", methods=["GET"])
 def index():
@@ -65,10 +112,30 @@ def serve_static(filename):
     return send_from_directory("static", filename)
 
 
+def is_admin_request():
+    """Whether the request carries ADMIN_TOKEN in its X-Admin-Token header."""
+    token = request.headers.get("X-Admin-Token")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(
+        (token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")
+    )
+
+
+def profiling_requested():
+    """Whether an upload asks for its job to be profiled (X-Debug-Profile: 1)."""
+    return request.headers.get("X-Debug-Profile", "").lower() in ("1", "true")
+
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
-    """Handle file upload and initiate processing."""
+    """
+    Handle file upload and initiate processing. Admins can add an
+    X-Debug-Profile: 1 header to have the job profiled (see /profile).
+    """
     try:
+        profile = profiling_requested()
+        if profile and not is_admin_request():
+            logger.warning("Rejected a profiling request without a valid admin token")
+            return jsonify({"error": "Profiling requires a valid X-Admin-Token"}), 403
         if "file" not in request.files:
             logger.error("No file part in the request")
             return jsonify({"error": "No file part"}), 400
@@ -87,35 +154,339 @@ def upload_file():
             )
 
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["RAW_FILE_FOLDER"], filename)
+        filepath = os.path.join(app.config["FILE_TO_PROCESS_FOLDER"], filename)
         file.save(filepath)
         logger.info(f"File uploaded successfully: {filepath}")
 
-        # Initialize processing status
-        processing_status[filename] = {
-            "status": "processing",
-            "progress": 0,
-            "details": "Starting PDF processing...",
-        }
-
-        # Start processing in a background thread
-        threading.Thread(target=process_pdf, args=(filepath, filename)).start()
+        submit_document(filepath, filename, profile)
         return render_template("processing.html", filename=filename)
     except Exception as e:
         logger.error(f"Error in upload_file: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
-def update_progress(filename, progress, details):
+@app.route("/documents", methods=["PUT"])
+def put_document():
+    """
+    Accept a raw application/pdf request body for processing, for machine
+    clients. The body is streamed to disk without multipart parsing. The name
+    is taken from a ?filename= argument or a Content-Disposition header, or
+    generated. Returns the job ID used with /process_status. Takes the same
+    X-Debug-Profile header as /upload.
+    """
+    try:
+        profile = profiling_requested()
+        if profile and not is_admin_request():
+            logger.warning("Rejected a profiling request without a valid admin token")
+            return jsonify({"error": "Profiling requires a valid X-Admin-Token"}), 403
+        if request.mimetype != "application/pdf":
+            logger.error(f"Invalid content type for PUT: {request.mimetype}")
+            return jsonify({"error": "Content-Type must be application/pdf"}), 415
+
+        _, disposition = parse_options_header(
+            request.headers.get("Content-Disposition", "")
+        )
+        filename = secure_filename(
+            request.args.get("filename") or disposition.get("filename") or ""
+        )
+        if not filename:
+            filename = f"document_{uuid.uuid4().hex}.pdf"
+        elif not filename.lower().endswith(".pdf"):
+            filename = f"{filename}.pdf"
+        filepath = os.path.join(app.config["FILE_TO_PROCESS_FOLDER"], filename)
+
+        # Written under a temporary name so folder watchers never see a partial
+        # PDF; unique per request, so concurrent PUTs of one name don't collide
+        partial_path = f"{filepath}.{uuid.uuid4().hex}.part"
+        size = 0
+        header = b""
+        try:
+            with open(partial_path, "wb") as f:
+                while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+                    if len(header) < 5:
+                        header += chunk[:5]
+                        # Stop early rather than storing a large non-PDF body
+                        if len(header) >= 5 and not header.startswith(b"%PDF-"):
+                            break
+                    f.write(chunk)
+                    size += len(chunk)
+            if not header.startswith(b"%PDF-"):
+                logger.error(f"PUT body for {filename} is not a PDF")
+                return jsonify({"error": "Body is not a PDF file"}), 400
+            os.replace(partial_path, filepath)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        logger.info(f"Document received: {filepath} ({size} bytes)")
+
+        submit_document(filepath, filename, profile)
+        return (
+            jsonify(
+                {
+                    "job_id": filename,
+                    "size": size,
+                    "status_url": url_for("process_status", filename=filename),
+                }
+            ),
+            202,
+        )
+    except RequestEntityTooLarge:
+        logger.error("PUT body exceeds MAX_CONTENT_LENGTH")
+        return jsonify({"error": "Document is too large"}), 413
+    except Exception as e:
+        logger.error(f"Error in put_document: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+def submit_document(filepath, filename, profile=False):
+    """
+    Pre-scan a stored upload, set up its checkpoint and queue it for processing.
+    :param profile: Profile the job's stages (see profiling.py)
+    """
+    # Estimate the job cost from a cheap pre-scan for scheduling
+    file_size = os.path.getsize(filepath)
+    try:
+        inspection = inspect_pdf(filepath, file_size)
+    except Exception as e:
+        logger.warning(f"Could not inspect {filename} for scheduling: {str(e)}")
+        inspection = {"file_size": file_size}
+
+    checkpoint = None
+    if CHECKPOINTS and job_queue is None:
+        checkpoint = JobCheckpoint(filename)
+        if checkpoint.claim():
+            checkpoint.start(filepath, filename=filename, inspection=inspection)
+        else:
+            logger.warning(f"{filename} is already being processed elsewhere")
+            checkpoint = None
+
+    queue_job(filepath, filename, inspection, checkpoint, profile=profile)
+
+    try:
+        blob_index.record(blob_digest(filepath), filepath, filename)
+    except OSError as e:
+        logger.warning(f"Could not index {filename} by content digest: {str(e)}")
+
+
+@app.route("/blobs/<digest>", methods=["GET"])
+def get_blob(digest):
+    """
+    Report whether an upload with this content digest (pipeline.blob_digest)
+    is already stored, and whether its processed text is available, so
+    clients can skip sending it again. HEAD returns just the status code.
+    """
+    blob = blob_index.lookup(digest.lower())
+    if blob is None:
+        return jsonify({"error": "Unknown blob"}), 404
+
+    filename = blob["filename"]
+    processed_filename = processed_filename_for(filename)
+    processed_filepath = os.path.join(
+        app.config["PROCESSED_FILE_FOLDER"], processed_filename
+    )
+    # A result older than the upload belongs to an earlier file with this name
+    processed = (
+        os.path.exists(processed_filepath)
+        and os.stat(processed_filepath).st_mtime_ns >= blob["mtime_ns"]
+    )
+    return jsonify(
+        {
+            "digest": blob["digest"],
+            "job_id": filename,
+            "size": blob["size"],
+            "status": job_status(filename),
+            "processed_url": (
+                url_for("get_processed_text", filename=processed_filename)
+                if processed
+                else None
+            ),
+        }
+    )
+
+
+@app.route("/blobs/<digest>/process", methods=["POST"])
+def process_blob(digest):
+    """Process an already stored upload by content digest instead of re-uploading it."""
+    blob = blob_index.lookup(digest.lower())
+    if blob is None:
+        return jsonify({"error": "Unknown blob"}), 404
+    filename = blob["filename"]
+    status = job_status(filename)
+    if status is None or status["status"] not in ("queued", "processing"):
+        logger.info(f"Processing stored blob {blob['digest']} as {filename}")
+        submit_document(blob["filepath"], filename)
+    return (
+        jsonify(
+            {
+                "job_id": filename,
+                "status_url": url_for("process_status", filename=filename),
+            }
+        ),
+        202,
+    )
+
+
+@app.route("/inspect", methods=["POST"])
+def inspect_file():
+    """Return page count, document info and content size without processing."""
+    try:
+        if "file" not in request.files:
+            logger.error("No file part in the request")
+            return jsonify({"error": "No file part"}), 400
+        file = request.files["file"]
+        if file.filename == "":
+            logger.error("No selected file")
+            return jsonify({"error": "No selected file"}), 400
+
+        start_time = time.perf_counter()
+        file.stream.seek(0, os.SEEK_END)
+        file_size = file.stream.tell()
+        file.stream.seek(0)
+        inspection = inspect_pdf(file.stream, file_size)
+        inspection["estimated_cost"] = estimate_job_cost(inspection)
+        inspection["inspection_time"] = calculate_processing_time(start_time)
+        if request.args.get("pages") != "1":
+            inspection.pop("page_content_bytes", None)
+        logger.info(
+            f"Inspected {file.filename}: {inspection['page_count']} pages "
+            f"in {inspection['inspection_time']:.3f} seconds"
+        )
+        return jsonify(inspection)
+    except Exception as e:
+        logger.error(f"Error in inspect_file: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
+def queue_job(
+    filepath, filename, inspection, checkpoint=None, details=None, profile=False
+):
+    """
+    Queue a job on the shared job queue if one is configured, otherwise
+    initialize its processing status and queue it on the job scheduler.
+    """
+    estimated_cost = estimate_job_cost(inspection)
+    if job_queue is not None:
+        payload = {"filename": filename, "inspection": inspection, "profile": profile}
+        job_queue.enqueue(filename, filepath, estimated_cost, payload)
+        return
+    estimated_seconds = sum(throughput_model.estimate_seconds(estimated_cost).values())
+    processing_status[filename] = {
+        "status": "queued",
+        "progress": 0,
+        "details": details or "Waiting for a processing slot...",
+        "page_count": inspection.get("page_count"),
+        "estimated_cost": estimated_cost,
+        "eta_seconds": estimated_seconds,
+        "poll_after": poll_interval(estimated_seconds),
+    }
+    job_scheduler.submit(
+        filename,
+        estimated_cost,
+        process_pdf,
+        filepath,
+        filename,
+        inspection,
+        checkpoint,
+        profile,
+    )
+
+
+def resume_unfinished_jobs():
+    """
+    Queue jobs left unfinished by a previous run (a restart or crash), resuming
+    from their checkpoints. Jobs claimed by another server process are skipped.
+    Jobs on a shared queue are recovered by the workers' lease expiry instead.
+    """
+    if not CHECKPOINTS or job_queue is not None:
+        return
+    resumed = 0
+    for checkpoint in unfinished_jobs():
+        job = checkpoint.load()
+        if job.get("failed") or not checkpoint.claim():
+            continue
+        if not os.path.exists(job["filepath"]):
+            logger.warning(f"Dropping checkpoint of {job['filename']}: file is gone")
+            checkpoint.clear()
+            continue
+        queue_job(
+            job["filepath"],
+            job["filename"],
+            job["inspection"],
+            checkpoint,
+            "Resuming after restart, waiting for a processing slot...",
+        )
+        resumed += 1
+    if resumed:
+        logger.info(f"Resumed {resumed} unfinished jobs from checkpoints")
+
+
+@app.route("/retry/<filename>", methods=["POST"])
+def retry_job(filename):
+    """Re-run a failed job, reusing the pages its checkpoint already holds."""
+    filename = secure_filename(filename)
+    if job_queue is not None:
+        job = job_queue.get(filename)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        if job["state"] != "failed":
+            return jsonify({"error": f"Job is {job['state']}"}), 409
+        queue_job(job["filepath"], filename, job["payload"]["inspection"])
+        logger.info(f"Retrying {filename} on the job queue")
+        return jsonify(job_queue.status(filename))
+
+    checkpoint = JobCheckpoint(filename)
+    job = checkpoint.load() if CHECKPOINTS else None
+    if job is None or not os.path.exists(job["filepath"]):
+        return jsonify({"error": "No checkpoint for this file"}), 404
+    if not checkpoint.claim():
+        return jsonify({"error": "File is already being processed"}), 409
+    # Recording the job again clears its failed mark
+    checkpoint.start(
+        job["filepath"], filename=job["filename"], inspection=job["inspection"]
+    )
+    queue_job(job["filepath"], job["filename"], job["inspection"], checkpoint)
+    logger.info(f"Retrying {job['filename']} from checkpoint")
+    return jsonify(processing_status[job["filename"]])
+
+
+def update_progress(filename, progress, details, eta_seconds=None):
     """Update the processing progress of a file."""
+    previous_progress = processing_status[filename].get("progress")
     processing_status[filename]["progress"] = progress
     processing_status[filename]["details"] = details
-    logger.info(f"Processing progress for {filename}: {progress}% - {details}")
-
-
-def process_pdf(filepath, filename):
-    """Process the uploaded PDF file."""
-    with app.app_context():
+    if eta_seconds is not None:
+        processing_status[filename]["eta_seconds"] = eta_seconds
+        processing_status[filename]["poll_after"] = poll_interval(eta_seconds)
+    # Per-page callbacks repeat the same percentage; only log when it moves
+    if progress != previous_progress:
+        logger.info(f"Processing progress for {filename}: {progress}% - {details}")
+
+
+def update_stage_progress(filename, job_progress, stage_progress, details):
+    """Update a file's progress from progress within its current stage."""
+    percent, eta_seconds = job_progress.update(stage_progress)
+    update_progress(filename, int(percent), details, eta_seconds)
+
+
+def process_pdf(filepath, filename, inspection=None, checkpoint=None, profile=False):
+    """
+    Process the uploaded PDF file. With a claimed checkpoint, completed
+    extraction pages and the preprocessed text are saved as they finish and
+    reused if the job runs again; the checkpoint is removed on success.
+    With profile, every stage call runs under cProfile and tracemalloc and
+    the results are saved for /profile/<filename>.
+    """
+    with app.app_context(), job_context(filename):
+        profiler = JobProfiler(filename) if profile else None
+
+        def run_stage(stage, func, *args, **kwargs):
+            if profiler is None:
+                return stage_executors.run(stage, func, *args, **kwargs)
+            result, stage_profile = stage_executors.run(
+                stage, run_profiled, func, *args, **kwargs
+            )
+            profiler.record(stage, stage_profile)
+            return result
 
         def timeout_handler():
             logger.error(
@@ -127,26 +498,39 @@ def process_pdf(filepath, filename):
                 "details": f"PDF processing timed out after {PROCESSING_TIMEOUT} seconds",
             }
 
-        timer = threading.Timer(PROCESSING_TIMEOUT, timeout_handler)
+        timer = threading.Timer(
+            PROCESSING_TIMEOUT,
+            contextvars.copy_context().run,
+            args=(timeout_handler,),
+        )
         timer.start()
         try:
+            processing_status[filename]["status"] = "processing"
             logger.info(f"Starting PDF processing for {filename}")
             file_size = os.path.getsize(filepath)
             logger.info(f"File size: {file_size} bytes")
+            if inspection is None:
+                inspection = inspect_pdf(filepath, file_size)
+            estimated_cost = estimate_job_cost(inspection)
+            job_progress = JobProgress(
+                throughput_model, estimated_cost, inspection.get("page_content_bytes")
+            )
 
             # NLTK resource loading
-            update_progress(filename, 5, "Loading NLTK resources...")
+            set_log_stage("nltk")
+            update_progress(filename, 0, "Loading NLTK resources...")
             start_time = time.perf_counter()
             download_nltk_resources()
             nltk_loading_time = calculate_processing_time(start_time)
             update_progress(
                 filename,
-                10,
+                0,
                 f"NLTK resources loaded in {nltk_loading_time:.3f} seconds",
             )
 
             # File reading
-            update_progress(filename, 15, "Reading PDF file...")
+            set_log_stage("read")
+            update_progress(filename, 0, "Reading PDF file...")
             try:
                 with open(filepath, "rb") as file:
                     logger.info(f"File opened successfully: {filepath}")
@@ -161,26 +545,33 @@ def process_pdf(filepath, filename):
                 return
 
             # Text extraction
-            update_progress(filename, 20, "Extracting text from PDF...")
+            set_log_stage("extract")
+            update_progress(filename, 0, "Extracting text from PDF...")
+            job_progress.start_stage("extract")
             start_time = time.perf_counter()
             logger.info("Extracting text from PDF")
             try:
-                raw_text = extract_text_from_pdf(
+                raw_text, extraction_stats = run_stage(
+                    "extract",
+                    extract_document,
                     filepath,
-                    lambda progress: update_progress(
+                    checkpoint,
+                    progress_callback=lambda progress: update_stage_progress(
                         filename,
-                        20 + int(progress * 0.3),
+                        job_progress,
+                        progress,
                         f"Extracting text: {progress:.1f}% complete",
                     ),
-                    current_app,
                 )
                 extraction_time = calculate_processing_time(start_time)
                 logger.info(
                     f"Text extracted from PDF, length: {len(raw_text)}, time taken: {extraction_time:.3f} seconds"
                 )
-                update_progress(
+                job_progress.start_stage("preprocess", extracted_chars=len(raw_text))
+                update_stage_progress(
                     filename,
-                    50,
+                    job_progress,
+                    0,
                     f"Text extracted, length: {len(raw_text)} characters, time: {extraction_time:.3f}s",
                 )
             except Exception as e:
@@ -194,25 +585,40 @@ def process_pdf(filepath, filename):
                 return
 
             # Text preprocessing
-            update_progress(filename, 60, "Preprocessing extracted text...")
+            set_log_stage("preprocess")
             start_time = time.perf_counter()
             logger.info("Preprocessing extracted text")
             try:
-                processed_text = preprocess_text(
-                    raw_text,
-                    lambda progress: update_progress(
-                        filename,
-                        60 + int(progress * 0.3),
-                        f"Preprocessing text: {progress:.1f}% complete",
-                    ),
-                )
+                processed_text = checkpoint and checkpoint.load_stage("preprocess")
+                preprocess_resumed = processed_text is not None
+                if preprocess_resumed:
+                    logger.info("Using preprocessed text from checkpoint")
+                    features = None
+                    if FEATURE_VECTORS:
+                        features = hashed_term_frequencies(processed_text.split())
+                else:
+                    processed_text, features = run_stage(
+                        "preprocess",
+                        preprocess_document,
+                        raw_text,
+                        progress_callback=lambda progress: update_stage_progress(
+                            filename,
+                            job_progress,
+                            progress,
+                            f"Preprocessing text: {progress:.1f}% complete",
+                        ),
+                    )
+                    if checkpoint:
+                        checkpoint.save_stage("preprocess", processed_text)
                 preprocessing_time = calculate_processing_time(start_time)
                 logger.info(
                     f"Text preprocessed, length: {len(processed_text)}, time taken: {preprocessing_time:.3f} seconds"
                 )
-                update_progress(
+                job_progress.start_stage("save", extracted_chars=len(raw_text))
+                update_stage_progress(
                     filename,
-                    90,
+                    job_progress,
+                    0,
                     f"Text preprocessed, length: {len(processed_text)} characters, time: {preprocessing_time:.3f}s",
                 )
             except Exception as e:
@@ -226,19 +632,23 @@ def process_pdf(filepath, filename):
                 return
 
             # Saving processed text
-            update_progress(filename, 95, "Saving processed text...")
-            processed_filename = f"processed_{filename}.txt"
-            processed_filepath = os.path.join(
-                app.config["UPLOAD_FOLDER"], processed_filename
-            )
-            logger.info(f"Saving processed text to: {processed_filepath}")
+            set_log_stage("save")
+            logger.info("Saving processed text")
             start_time = time.perf_counter()
             try:
-                with open(processed_filepath, "w", encoding="utf-8") as f:
-                    f.write(processed_text)
+                saved = save_document(
+                    run_stage,
+                    filename,
+                    app.config["PROCESSED_FILE_FOLDER"],
+                    raw_text,
+                    extraction_stats["page_offsets"],
+                    processed_text,
+                    features,
+                    similarity_index,
+                )
                 saving_time = calculate_processing_time(start_time)
                 logger.info(
-                    f"Processed text saved successfully: {processed_filepath}, time taken: {saving_time:.3f} seconds"
+                    f"Processed text saved successfully: {saved['processed_file_path']}, time taken: {saving_time:.3f} seconds"
                 )
             except IOError as e:
                 error_msg = f"Error saving processed text: {str(e)}"
@@ -250,6 +660,13 @@ def process_pdf(filepath, filename):
                 }
                 return
 
+            # Stages resumed from a checkpoint took a fraction of their real time
+            stage_seconds = job_progress.finish()
+            if extraction_stats["resumed_pages"]:
+                del stage_seconds["extract"]
+            if preprocess_resumed:
+                del stage_seconds["preprocess"]
+            throughput_model.record(estimated_cost, len(raw_text), stage_seconds)
             total_time = (
                 nltk_loading_time + extraction_time + preprocessing_time + saving_time
             )
@@ -257,18 +674,27 @@ def process_pdf(filepath, filename):
             processing_status[filename] = {
                 "status": "complete",
                 "progress": 100,
-                "filename": processed_filename,
+                "filename": saved["filename"],
                 "details": f"Processing completed in {total_time:.3f} seconds",
                 "file_size": file_size,
                 "extracted_length": len(raw_text),
                 "processed_length": len(processed_text),
+                "token_count": extraction_stats["token_count"],
+                "token_count_method": extraction_stats["token_count_method"],
+                "chunks_filename": saved["chunks_filename"],
+                "chunk_count": saved["chunk_count"],
+                "features_filename": saved["features_filename"],
+                "near_duplicates": saved["near_duplicates"],
+                "profile_url": f"/profile/{filename}" if profiler else None,
                 "extraction_time": extraction_time,
                 "preprocessing_time": preprocessing_time,
                 "saving_time": saving_time,
                 "nltk_loading_time": nltk_loading_time,
                 "total_time": total_time,
+                "skipped_pages": extraction_stats["skipped_pages"],
+                "image_only_pages": extraction_stats["image_only_pages"],
                 "file_path": filepath,
-                "processed_file_path": processed_filepath,
+                "processed_file_path": saved["processed_file_path"],
             }
         except Exception as e:
             error_msg = f"Unexpected error processing PDF {filename}: {str(e)}"
@@ -280,14 +706,39 @@ def process_pdf(filepath, filename):
             }
         finally:
             timer.cancel()
+            if profiler is not None:
+                try:
+                    profiler.save()
+                except OSError as e:
+                    logger.error(f"Could not save the profile of {filename}: {str(e)}")
+            if checkpoint is not None:
+                if processing_status[filename]["status"] == "complete":
+                    checkpoint.clear()
+                else:
+                    # Kept for /retry, but not resumed automatically on restart
+                    checkpoint.fail(processing_status[filename]["details"])
+                    checkpoint.release()
+
+
+def job_status(filename):
+    """Return the current status of a job, or None if it is unknown."""
+    if job_queue is not None:
+        return job_queue.status(filename)
+    if filename not in processing_status:
+        return None
+    status = dict(processing_status[filename])
+    if status["status"] == "queued":
+        status["queue_position"] = job_scheduler.queue_position(filename)
+    return status
 
 
 @app.route("/process_status/<filename>", methods=["GET"])
 def process_status(filename):
     """Check the processing status of a file."""
     logger.info(f"Checking process status for: {filename}")
-    if filename in processing_status:
-        return jsonify(processing_status[filename])
+    status = job_status(filename)
+    if status is not None:
+        return jsonify(status)
     else:
         return jsonify(
             {
@@ -298,6 +749,52 @@ def process_status(filename):
         )
 
 
+@app.route("/similar/<job_id>", methods=["GET"])
+def similar_documents(job_id):
+    """
+    List processed documents that nearly duplicate a processed job, with
+    their estimated similarity. The optional "threshold" query parameter
+    overrides NEAR_DUPLICATE_THRESHOLD.
+    """
+    if similarity_index is None:
+        return jsonify({"error": "Near-duplicate detection is disabled"}), 404
+    threshold = request.args.get("threshold")
+    if threshold is not None:
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            return jsonify({"error": "Invalid threshold"}), 400
+    similar = similarity_index.similar(job_id, threshold)
+    if similar is None:
+        return jsonify({"error": "Job not found in the similarity index"}), 404
+    return jsonify({"job_id": job_id, "similar": similar})
+
+
+@app.route("/profile/<job_id>", methods=["GET"])
+def get_profile(job_id):
+    """
+    Admin only: the profile report of a job submitted with X-Debug-Profile,
+    with per-stage timings, top functions and top allocation sites.
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    report = load_profile_report(os.path.basename(job_id))
+    if report is None:
+        return jsonify({"error": "No profile for this job"}), 404
+    return jsonify(report)
+
+
+@app.route("/profile/<job_id>/<name>", methods=["GET"])
+def get_profile_file(job_id, name):
+    """Admin only: download a job's profile.pstats, stage .pstats or report.json."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    filepath = safe_join(PROFILE_FOLDER, os.path.basename(job_id), name)
+    if filepath is None or not os.path.isfile(filepath):
+        return jsonify({"error": "File not found"}), 404
+    return send_file(filepath, as_attachment=True)
+
+
 @app.route("/processing/<filename>")
 def processing(filename):
     """Render the processing page for a specific file."""
@@ -313,11 +810,11 @@ def get_processed_text(filename: str):
         filename = filename.decode("utf-8")  # Convert bytes to string if necessary
 
     sanitized_filename = os.path.basename(filename)
-    folder = app.config["FILE_PROCESSED_FOLDER"]
+    folder = app.config["PROCESSED_FILE_FOLDER"]
 
     if not isinstance(folder, (str, bytes)):
         raise TypeError(
-            "Configuration FILE_PROCESSED_FOLDER must be of type str or bytes"
+            "Configuration PROCESSED_FILE_FOLDER must be of type str or bytes"
         )
 
     filepath = os.path.join(folder, sanitized_filename)
@@ -331,6 +828,24 @@ def get_processed_text(filename: str):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/latest_logs", methods=["GET"])
+def latest_logs():
+    """Return log lines recorded after the client's cursor, optionally for one job."""
+    lines, cursor = log_buffer.tail(
+        cursor=request.args.get("cursor", type=int),
+        job_id=request.args.get("job_id"),
+        limit=request.args.get("limit", default=200, type=int),
+    )
+    return jsonify({"logs": lines, "cursor": cursor})
+
+
+@app.route("/logs", methods=["GET"])
+def view_logs():
+    """Render the most recent application logs."""
+    lines, _ = log_buffer.tail(limit=request.args.get("limit", default=500, type=int))
+    return render_template("view_logs.html", logs="\n".join(lines))
+
+
 @app.errorhandler(500)
 def internal_server_error(e):
     """Handle internal server errors."""
@@ -0,0 +1,315 @@
+# batch_process.py
+"""
+Offline batch processor: runs the extract -> preprocess -> save pipeline over a
+directory tree or a list of PDFs using a process pool.
+
+Usage:
+    python batch_process.py archive/ more.pdf --workers 8
+    python batch_process.py --file-list files.txt --output data/backfill
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from config import PROCESSED_FILE_FOLDER
+from fileutils import atomic_write
+from logging_config import logger
+from pipeline import file_sha256, process_document
+from text_preprocessor import download_nltk_resources
+
+MANIFEST_FILENAME = ".processed_hashes.json"
+MANIFEST_SAVE_INTERVAL = 100  # completed files between manifest writes
+
+# Content hashes already processed, set in each worker by _init_worker
+_known_hashes = frozenset()
+
+
+def collect_pdf_files(paths, file_list=None):
+    """
+    Expand directories and file lists into (pdf_path, relative_output_dir) pairs.
+    :param paths: Files or directories given on the command line
+    :param file_list: Optional text file with one PDF path per line
+    :return: List of (pdf_path, relative_output_dir) tuples
+    """
+    files = []
+    if file_list:
+        with open(file_list, encoding="utf-8") as f:
+            paths = list(paths) + [line.strip() for line in f if line.strip()]
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                relative_dir = os.path.relpath(root, path)
+                files.extend(
+                    (os.path.join(root, name), relative_dir)
+                    for name in sorted(names)
+                    if name.lower().endswith(".pdf")
+                )
+        elif os.path.isfile(path):
+            files.append((path, "."))
+        else:
+            logger.warning(f"Skipping missing path: {path}")
+    return _unique_output_dirs(files)
+
+
+def _unique_output_dirs(files):
+    """
+    Drop repeated paths and give PDFs that would be written to the same output
+    file (the same name in the same relative folder, e.g. listed from different
+    directories) output folders named after where they came from.
+    """
+    seen = set()
+    groups = defaultdict(list)
+    for filepath, relative_dir in files:
+        absolute_path = os.path.abspath(filepath)
+        if absolute_path in seen:
+            continue
+        seen.add(absolute_path)
+        key = (os.path.normpath(relative_dir), os.path.basename(filepath))
+        groups[key].append((filepath, relative_dir, absolute_path))
+
+    unique = {}
+    for group in groups.values():
+        if len(group) == 1:
+            filepath, relative_dir, _ = group[0]
+            unique[filepath] = relative_dir
+            continue
+        folders = [os.path.dirname(absolute_path) for _, _, absolute_path in group]
+        common = os.path.commonpath(folders)
+        for (filepath, _, _), folder in zip(group, folders):
+            unique[filepath] = os.path.relpath(folder, common)
+        logger.warning(
+            f"{len(group)} inputs are named {os.path.basename(group[0][0])}; "
+            f"writing them to separate output folders"
+        )
+    # In input order, each path once
+    return [
+        (filepath, unique.pop(filepath)) for filepath, _ in files if filepath in unique
+    ]
+
+
+def load_manifest(output_folder):
+    """Load the content-hash manifest of previously processed files."""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_folder, manifest):
+    """Atomically write the content-hash manifest."""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+    with atomic_write(manifest_path) as f:
+        json.dump(manifest, f)
+
+
+def _init_worker(known_hashes, log_level):
+    global _known_hashes
+    _known_hashes = known_hashes
+    logger.setLevel(log_level)
+
+
+def _process_one(filepath, output_folder):
+    """Worker entry point: hash the file, skip it if known, otherwise process it."""
+    start_time = time.perf_counter()
+    try:
+        content_hash = file_sha256(filepath)
+        if content_hash in _known_hashes:
+            return {"status": "skipped", "file_path": filepath, "hash": content_hash}
+        result = process_document(filepath, output_folder)
+        result.update(status="complete", hash=content_hash)
+        return result
+    except Exception as e:
+        return {
+            "status": "error",
+            "file_path": filepath,
+            "details": str(e),
+            "total_time": time.perf_counter() - start_time,
+        }
+
+
+def run_batch(files, output_folder, workers, force=False, log_level=logging.WARNING):
+    """
+    Process files across a process pool, printing per-file and aggregate progress.
+    :return: Summary report dictionary
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = {} if force else load_manifest(output_folder)
+    known_hashes = frozenset(manifest)
+
+    summary = {
+        "total_files": len(files),
+        "complete": 0,
+        "skipped": 0,
+        "error": 0,
+        "bytes_processed": 0,
+        "errors": [],
+    }
+    start_time = time.perf_counter()
+    pending = iter(files)
+    in_flight = {}
+    done_count = 0
+
+    def start_pool():
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(known_hashes, log_level),
+        )
+
+    def submit_more(executor):
+        # Keep a bounded number of tasks queued so huge archives don't
+        # materialize one future per file up front
+        while len(in_flight) < workers * 4:
+            entry = next(pending, None)
+            if entry is None:
+                return
+            filepath, relative_dir = entry
+            target = os.path.normpath(os.path.join(output_folder, relative_dir))
+            in_flight[executor.submit(_process_one, filepath, target)] = filepath
+
+    def collect(future):
+        nonlocal done_count
+        filepath = in_flight.pop(future)
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # The pool can't tell which of its files killed the worker
+            result = {
+                "status": "error",
+                "file_path": filepath,
+                "details": "Worker process died (e.g. killed for using too much memory)",
+                "total_time": 0.0,
+            }
+        status = result["status"]
+        summary[status] += 1
+        done_count += 1
+
+        if status == "complete":
+            summary["bytes_processed"] += result["file_size"]
+            manifest[result["hash"]] = {
+                "source": result["file_path"],
+                "processed_file_path": result["processed_file_path"],
+            }
+            detail = f"{result['total_time']:.2f}s"
+        elif status == "skipped":
+            detail = "already processed"
+        else:
+            summary["errors"].append(
+                {"file_path": result["file_path"], "error": result["details"]}
+            )
+            detail = result["details"]
+
+        elapsed = time.perf_counter() - start_time
+        rate = done_count / elapsed if elapsed else 0.0
+        remaining = (len(files) - done_count) / rate if rate else 0.0
+        print(
+            f"[{done_count}/{len(files)}] {status}: {result['file_path']} "
+            f"({detail}) | {rate:.2f} files/s, ETA {remaining:.0f}s",
+            flush=True,
+        )
+
+        if done_count % MANIFEST_SAVE_INTERVAL == 0:
+            save_manifest(output_folder, manifest)
+
+    executor = start_pool()
+    try:
+        submit_more(executor)
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                broken |= isinstance(future.exception(), BrokenProcessPool)
+                collect(future)
+            if broken:
+                # Every task left on the dead pool fails with it
+                for future in wait(list(in_flight)).done:
+                    collect(future)
+                save_manifest(output_folder, manifest)
+                logger.error("A worker process died; restarting the process pool")
+                executor.shutdown(wait=False)
+                executor = start_pool()
+            submit_more(executor)
+    finally:
+        executor.shutdown()
+
+    save_manifest(output_folder, manifest)
+    elapsed = time.perf_counter() - start_time
+    summary.update(
+        {
+            "workers": workers,
+            "elapsed_time": elapsed,
+            "files_per_second": done_count / elapsed if elapsed else 0.0,
+            "megabytes_per_second": (
+                summary["bytes_processed"] / (1024 * 1024) / elapsed if elapsed else 0.0
+            ),
+        }
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Process PDFs offline using all CPU cores."
+    )
+    parser.add_argument("paths", nargs="*", help="PDF files or directories")
+    parser.add_argument("--file-list", help="Text file with one PDF path per line")
+    parser.add_argument(
+        "--output",
+        default=PROCESSED_FILE_FOLDER,
+        help="Output folder (default: PROCESSED_FILE_FOLDER)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--report", help="Summary report path (default: <output>/batch_report_*.json)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocess files seen before"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Keep INFO logging in workers"
+    )
+    args = parser.parse_args(argv)
+
+    files = collect_pdf_files(args.paths, args.file_list)
+    if not files:
+        parser.error("no PDF files found")
+
+    download_nltk_resources()
+    logger.info(f"Batch processing {len(files)} files with {args.workers} workers")
+    summary = run_batch(
+        files,
+        args.output,
+        args.workers,
+        force=args.force,
+        log_level=logging.INFO if args.verbose else logging.WARNING,
+    )
+
+    report_path = args.report or os.path.join(
+        args.output, f"batch_report_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(
+        f"Done: {summary['complete']} processed, {summary['skipped']} skipped, "
+        f"{summary['error']} failed in {summary['elapsed_time']:.1f}s "
+        f"({summary['files_per_second']:.2f} files/s, "
+        f"{summary['megabytes_per_second']:.2f} MB/s). Report: {report_path}"
+    )
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# blob_index.py
+"""
+Index of stored uploads by content digest (pipeline.blob_digest), so clients
+can ask whether the server already has a file before sending it.
+
+Each entry is a small JSON file named after the digest, pointing at the
+upload in FILE_TO_PROCESS_FOLDER. Entries are written atomically, so several
+server processes can share the folder, and an entry whose upload has since
+been replaced or deleted is treated as missing.
+"""
+
+import json
+import os
+import re
+from config import BLOB_FOLDER
+from fileutils import atomic_write
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobIndex:
+    """Maps content digests to stored uploads."""
+
+    def __init__(self, folder=BLOB_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _entry_path(self, digest):
+        return os.path.join(self.folder, f"{digest}.json")
+
+    def record(self, digest, filepath, filename):
+        """Remember that filepath (processed as job filename) has this digest."""
+        stat = os.stat(filepath)
+        entry = {
+            "digest": digest,
+            "filename": filename,
+            "filepath": filepath,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        with atomic_write(self._entry_path(digest)) as f:
+            json.dump(entry, f)
+
+    def lookup(self, digest):
+        """Return the entry for digest, or None if no current upload has it."""
+        if not _DIGEST_RE.match(digest):
+            return None
+        try:
+            with open(self._entry_path(digest), encoding="utf-8") as f:
+                entry = json.load(f)
+            stat = os.stat(entry["filepath"])
+        except (OSError, ValueError, KeyError):
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+            return None
+        return entry
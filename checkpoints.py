@@ -0,0 +1,162 @@
+# checkpoints.py
+"""
+On-disk checkpoints of in-progress processing jobs.
+
+Each job gets a folder under CHECKPOINT_FOLDER holding:
+
+    job.json                  what is needed to resubmit the job
+    pages_000001-000050.json  extracted page ranges, written as extraction runs
+    preprocess.txt            preprocessed text, once that stage has finished
+    lock                      locked by the process running the job
+
+The lock is released by the OS when its holder exits, so after a restart (or
+with several server processes) exactly one process claims each unfinished job
+and resumes it from the last completed page range. POSIX record locks are
+used rather than flock() because they are not inherited by forked children
+such as the stage worker processes.
+"""
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+from logging_config import logger
+from config import CHECKPOINT_FOLDER
+from fileutils import atomic_write
+
+_PAGES_FILE_RE = re.compile(r"^pages_(\d+)-(\d+)\.json$")
+
+# Checkpoint paths claimed by this process; record locks don't conflict
+# within the process that holds them
+_claimed = set()
+_claimed_lock = threading.Lock()
+
+
+def _write_atomic(path, data):
+    with atomic_write(path) as f:
+        f.write(data)
+
+
+def _file_fingerprint(filepath):
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class JobCheckpoint:
+    """Checkpoint folder of one job; picklable so extraction workers can write to it."""
+
+    def __init__(self, job_id, folder=CHECKPOINT_FOLDER):
+        self.job_id = job_id
+        self.path = os.path.join(folder, job_id)
+        self._lock_file = None
+
+    def __getstate__(self):
+        # The lock stays with the process that claimed the job
+        return {"job_id": self.job_id, "path": self.path, "_lock_file": None}
+
+    def claim(self):
+        """Take the job's lock without blocking; return False if another process holds it."""
+        with _claimed_lock:
+            if self.path in _claimed:
+                return False
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = open(os.path.join(self.path, "lock"), "w")
+            try:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            _claimed.add(self.path)
+        self._lock_file = lock_file
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            with _claimed_lock:
+                self._lock_file.close()
+                _claimed.discard(self.path)
+            self._lock_file = None
+
+    def start(self, filepath, **metadata):
+        """
+        Record a job for filepath, discarding checkpoints left by an earlier
+        job with the same id unless they were made from the same file.
+        :param metadata: JSON-serializable values returned again by load()
+        """
+        fingerprint = _file_fingerprint(filepath)
+        previous = self.load()
+        if previous is not None and previous["fingerprint"] != fingerprint:
+            logger.info(f"Discarding stale checkpoint for {self.job_id}")
+            for name in os.listdir(self.path):
+                if name != "lock":
+                    os.remove(os.path.join(self.path, name))
+        os.makedirs(self.path, exist_ok=True)
+        job = dict(metadata, filepath=filepath, fingerprint=fingerprint)
+        _write_atomic(os.path.join(self.path, "job.json"), json.dumps(job))
+
+    def load(self):
+        """Return the metadata recorded by start(), or None."""
+        try:
+            with open(os.path.join(self.path, "job.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def fail(self, reason):
+        """Mark the job failed so it is left for an explicit retry."""
+        job = self.load()
+        if job is not None:
+            job["failed"] = reason
+            _write_atomic(os.path.join(self.path, "job.json"), json.dumps(job))
+
+    def save_pages(self, records):
+        """
+        Write a completed, contiguous range of page records.
+        :param records: List of (page_num, text, error) tuples, in page order
+        """
+        name = f"pages_{records[0][0]:06d}-{records[-1][0]:06d}.json"
+        _write_atomic(os.path.join(self.path, name), json.dumps(records))
+
+    def load_pages(self):
+        """Return the checkpointed (page_num, text, error) records from page 1 on."""
+        ranges = []
+        for name in os.listdir(self.path) if os.path.isdir(self.path) else []:
+            match = _PAGES_FILE_RE.match(name)
+            if match:
+                ranges.append((int(match.group(1)), int(match.group(2)), name))
+        records = []
+        for first, last, name in sorted(ranges):
+            if first != len(records) + 1:
+                break  # a gap: later ranges are unusable
+            with open(os.path.join(self.path, name), encoding="utf-8") as f:
+                records.extend(tuple(record) for record in json.load(f))
+        return records
+
+    def save_stage(self, stage, text):
+        """Keep the output of a finished stage."""
+        _write_atomic(os.path.join(self.path, f"{stage}.txt"), text)
+
+    def load_stage(self, stage):
+        """Return the saved output of a finished stage, or None."""
+        try:
+            with open(os.path.join(self.path, f"{stage}.txt"), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def clear(self):
+        """Remove the checkpoint once the job has completed."""
+        self.release()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def unfinished_jobs(folder=CHECKPOINT_FOLDER):
+    """Return checkpoints of recorded jobs that have not been cleared."""
+    if not os.path.isdir(folder):
+        return []
+    checkpoints = [
+        JobCheckpoint(job_id, folder) for job_id in sorted(os.listdir(folder))
+    ]
+    return [checkpoint for checkpoint in checkpoints if checkpoint.load() is not None]
@@ -0,0 +1,108 @@
+# chunker.py
+"""
+Split extracted text into overlapping chunks sized for model context windows.
+
+Chunks are built in a single pass over the words of the text: words are added
+until the next one would exceed CHUNK_MAX_TOKENS model tokens (as counted by
+text_preprocessor.count_tokens, summed word by word), the
+chunk is emitted, and its trailing CHUNK_OVERLAP_TOKENS worth of words start
+the next chunk. Each chunk records its character offsets in the extracted
+text and the pages it spans, and becomes one JSONL line.
+
+Building the chunks is CPU-bound, so web jobs run write_chunks in a stage
+worker process. It streams each line to the file as its chunk is built, so
+neither the chunks nor their JSON are held in memory or sent between
+processes.
+"""
+
+import bisect
+import json
+import os
+import re
+from collections import deque
+from logging_config import logger
+from text_preprocessor import count_tokens
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from fileutils import atomic_write
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def iter_chunks(
+    text,
+    page_offsets=(),
+    max_tokens=CHUNK_MAX_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+):
+    """
+    Yield overlapping chunks of text.
+    :param text: Extracted document text
+    :param page_offsets: List of (page_num, start offset in text) pairs in
+        text order, as recorded by extract_text_from_pdf
+    :param max_tokens: Token budget of a chunk; a single word over budget
+        becomes a chunk of its own
+    :param overlap_tokens: Tokens repeated from the end of one chunk at the
+        start of the next
+    :return: Iterator of chunk dictionaries with the chunk text, its
+        start_char/end_char offsets, page_start/page_end and token count
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError(
+            f"Chunk overlap ({overlap_tokens} tokens) must be smaller than the "
+            f"chunk size ({max_tokens} tokens)"
+        )
+    page_starts = [offset for _, offset in page_offsets]
+    page_nums = [page_num for page_num, _ in page_offsets]
+
+    def page_at(offset):
+        index = bisect.bisect_right(page_starts, offset) - 1
+        return page_nums[max(index, 0)] if page_nums else None
+
+    def make_chunk(index):
+        start, end = words[0][0], words[-1][1]
+        return {
+            "chunk": index,
+            "text": text[start:end],
+            "start_char": start,
+            "end_char": end,
+            "page_start": page_at(start),
+            "page_end": page_at(end - 1),
+            "tokens": chunk_tokens,
+        }
+
+    words = deque()  # (start, end, tokens) of the words in the current chunk
+    chunk_tokens = 0
+    index = 0
+    previous_end = 0
+    for match in _WORD_RE.finditer(text):
+        # Counted with the whitespace before it, which BPE merges into the word
+        tokens = count_tokens(text[previous_end : match.end()], cache=False)
+        previous_end = match.end()
+        if words and chunk_tokens + tokens > max_tokens:
+            yield make_chunk(index)
+            index += 1
+            while words and (
+                chunk_tokens > overlap_tokens or chunk_tokens + tokens > max_tokens
+            ):
+                chunk_tokens -= words.popleft()[2]
+        words.append((match.start(), match.end(), tokens))
+        chunk_tokens += tokens
+    if words:
+        yield make_chunk(index)
+
+
+def write_chunks(text, filepath, page_offsets=(), **kwargs):
+    """
+    Write the chunks of text to filepath as JSONL, one line per chunk as it is
+    built, replacing filepath only once every chunk has been written.
+    :param kwargs: max_tokens and overlap_tokens for iter_chunks()
+    :return: Number of chunks written
+    """
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    count = 0
+    with atomic_write(filepath) as f:
+        for chunk in iter_chunks(text, page_offsets, **kwargs):
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            count += 1
+    logger.info(f"Wrote {count} chunks to {filepath}")
+    return count
@@ -20,3 +20,200 @@ PROCESSING_TIMEOUT = int(get_env_variable("PROCESSING_TIMEOUT", 300))  # 5 minut
 
 LOG_DIRECTORY = get_env_variable("LOG_DIRECTORY")
 LOG_LEVEL = get_env_variable("LOG_LEVEL", "INFO").upper()
+
+# Optional token normalization applied by preprocess_text: "none", "stem" or "lemma"
+TEXT_NORMALIZATION = get_env_variable("TEXT_NORMALIZATION", "none").lower()
+if TEXT_NORMALIZATION not in ("none", "stem", "lemma"):
+    raise ValueError(
+        f"TEXT_NORMALIZATION must be 'none', 'stem' or 'lemma', not '{TEXT_NORMALIZATION}'"
+    )
+NORMALIZATION_CACHE_SIZE = int(get_env_variable("NORMALIZATION_CACHE_SIZE", 100000))
+
+# Optional hashed term-frequency vectors of the preprocessed tokens, written
+# next to the processed text as features_<file>.npz
+FEATURE_VECTORS = get_env_variable("FEATURE_VECTORS", "false").lower() == "true"
+FEATURE_DIMENSION = int(
+    get_env_variable("FEATURE_DIMENSION", 2**18)
+)  # number of hash buckets terms are counted in
+
+# Model token counts reported for documents and chunks: exact BPE counts when
+# a tiktoken-format ranks file (e.g. cl100k_base.tiktoken) exists at
+# BPE_RANKS_FILE, otherwise a fast approximation
+BPE_RANKS_FILE = get_env_variable("BPE_RANKS_FILE", "data/cl100k_base.tiktoken")
+TOKEN_COUNT_CACHE_SIZE = int(
+    get_env_variable("TOKEN_COUNT_CACHE_SIZE", 1024)
+)  # texts whose token counts are remembered by content hash
+
+# Unicode-normalize extracted page text and repair ligatures, soft hyphens,
+# line-end hyphenation and stray whitespace before it is tokenized
+CLEAN_PAGE_TEXT = get_env_variable("CLEAN_PAGE_TEXT", "true").lower() == "true"
+
+# Strip running headers/footers that repeat across pages of a document
+STRIP_REPEATED_LINES = (
+    get_env_variable("STRIP_REPEATED_LINES", "true").lower() == "true"
+)
+REPEATED_LINE_THRESHOLD = float(
+    get_env_variable("REPEATED_LINE_THRESHOLD", 0.5)
+)  # fraction of pages a line must appear on
+REPEATED_LINE_EDGE = int(
+    get_env_variable("REPEATED_LINE_EDGE", 3)
+)  # lines checked at the top and bottom of each page
+
+# Watch-folder ingestion daemon (watch_folder.py). Its inbox is kept apart
+# from FILE_TO_PROCESS_FOLDER, where the server stores uploads it is processing
+WATCH_FOLDER = get_env_variable("WATCH_FOLDER", "data/file_processing/inbox")
+WATCH_POLL_INTERVAL = float(get_env_variable("WATCH_POLL_INTERVAL", 1.0))  # seconds
+WATCH_SETTLE_SECONDS = float(
+    get_env_variable("WATCH_SETTLE_SECONDS", 2.0)
+)  # a file must stop changing for this long before it is processed
+WATCH_MAX_WORKERS = int(get_env_variable("WATCH_MAX_WORKERS", os.cpu_count() or 1))
+
+LOG_BUFFER_SIZE = int(
+    get_env_variable("LOG_BUFFER_SIZE", 2000)
+)  # records kept in memory for /latest_logs
+
+LOG_FORMAT = get_env_variable("LOG_FORMAT", "text").lower()  # "text" or "json"
+LOG_SAMPLE_EVERY = int(
+    get_env_variable("LOG_SAMPLE_EVERY", 50)
+)  # per-page/per-batch events are summarized every N pages or batches
+
+# Production server (gunicorn.conf.py)
+SERVER_BIND = get_env_variable("SERVER_BIND", "0.0.0.0:5001")
+# Processing status lives in each worker's memory unless a shared job queue
+# (JOB_QUEUE_URL) holds it, so only then is more than one worker safe by default
+SERVER_WORKERS = int(
+    get_env_variable(
+        "SERVER_WORKERS",
+        (os.cpu_count() or 1) if get_env_variable("JOB_QUEUE_URL") else 1,
+    )
+)
+SERVER_THREADS = int(get_env_variable("SERVER_THREADS", 4))
+SERVER_TIMEOUT = int(get_env_variable("SERVER_TIMEOUT", 120))  # seconds
+
+# Extract pages in a supervised subprocess so pathological pages can be skipped
+EXTRACTION_ISOLATE_PAGES = (
+    get_env_variable("EXTRACTION_ISOLATE_PAGES", "false").lower() == "true"
+)
+PAGE_TIMEOUT = float(get_env_variable("PAGE_TIMEOUT", 30))  # seconds per page
+PAGE_MEMORY_LIMIT_MB = int(
+    get_env_variable("PAGE_MEMORY_LIMIT_MB", 1024)
+)  # extra address space the extraction subprocess may use
+
+# Skip the text extractor on pages whose content stream shows no text
+SKIP_IMAGE_ONLY_PAGES = (
+    get_env_variable("SKIP_IMAGE_ONLY_PAGES", "true").lower() == "true"
+)
+
+# Cache decoded font/ToUnicode maps while extracting a document
+FONT_CACHE = get_env_variable("FONT_CACHE", "true").lower() == "true"
+SHARED_FONT_CACHE_SIZE = int(
+    get_env_variable("SHARED_FONT_CACHE_SIZE", 0)
+)  # fonts reused across documents by embedded font hash; 0 disables
+
+# Job scheduling (scheduler.py)
+# "fifo", "sjf" (shortest job first) or "fair" (weighted-fair across job sizes)
+SCHEDULER_POLICY = get_env_variable("SCHEDULER_POLICY", "sjf").lower()
+SCHEDULER_WORKERS = int(get_env_variable("SCHEDULER_WORKERS", 2))
+SCHEDULER_AGING = float(
+    get_env_variable("SCHEDULER_AGING", 1.0)
+)  # cost units a waiting job gains per second under sjf
+SCHEDULER_MAX_WAIT = float(
+    get_env_variable("SCHEDULER_MAX_WAIT", 600)
+)  # seconds after which a job runs next regardless of policy
+
+# Throughput model used for progress and ETA (progress_model.py)
+THROUGHPUT_SMOOTHING = float(
+    get_env_variable("THROUGHPUT_SMOOTHING", 0.2)
+)  # weight of the latest completed job in the rolling averages
+THROUGHPUT_MODEL_PATH = get_env_variable(
+    "THROUGHPUT_MODEL_PATH"
+)  # optional JSON file so learned rates survive restarts
+
+# Stage executors for web processing jobs (stage_executors.py)
+# Processes for extraction and preprocessing, per server worker; 0 runs them
+# in the job thread. No more jobs than SCHEDULER_WORKERS run at once, so a
+# larger pool would only hold idle processes
+PIPELINE_CPU_WORKERS = int(
+    get_env_variable(
+        "PIPELINE_CPU_WORKERS", min(SCHEDULER_WORKERS, os.cpu_count() or 1)
+    )
+)
+PIPELINE_IO_WORKERS = int(get_env_variable("PIPELINE_IO_WORKERS", 2))
+PIPELINE_QUEUE_SIZE = int(
+    get_env_variable("PIPELINE_QUEUE_SIZE", 2)
+)  # jobs allowed to wait per stage before upstream jobs block
+
+# Checkpoints of in-progress web jobs, resumed after a restart (checkpoints.py)
+CHECKPOINTS = get_env_variable("CHECKPOINTS", "true").lower() == "true"
+CHECKPOINT_FOLDER = get_env_variable(
+    "CHECKPOINT_FOLDER", "data/file_processing/checkpoints"
+)
+CHECKPOINT_INTERVAL_PAGES = int(
+    get_env_variable("CHECKPOINT_INTERVAL_PAGES", 50)
+)  # extracted pages between checkpoint writes
+
+# Shared job queue for standalone workers (job_queue.py, worker.py)
+JOB_QUEUE_URL = get_env_variable(
+    "JOB_QUEUE_URL"
+)  # "sqlite:///path/jobs.db" or "postgresql://..."; unset processes in the web process
+JOB_LEASE_SECONDS = float(
+    get_env_variable("JOB_LEASE_SECONDS", 60)
+)  # a job whose worker stops heartbeating is re-queued after this long
+JOB_HEARTBEAT_INTERVAL = float(get_env_variable("JOB_HEARTBEAT_INTERVAL", 15))
+JOB_MAX_ATTEMPTS = int(get_env_variable("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = float(
+    get_env_variable("JOB_RETRY_DELAY", 30)
+)  # seconds before a failed attempt is retried
+WORKER_CONCURRENCY = int(get_env_variable("WORKER_CONCURRENCY", os.cpu_count() or 1))
+WORKER_POLL_INTERVAL = float(
+    get_env_variable("WORKER_POLL_INTERVAL", 1.0)
+)  # seconds between queue polls while idle
+
+# Raw PUT /documents ingestion
+UPLOAD_CHUNK_SIZE = int(
+    get_env_variable("UPLOAD_CHUNK_SIZE", 1024 * 1024)
+)  # bytes read from the request stream per write
+
+# Token-budgeted chunks of the extracted text written alongside the processed
+# text, as JSONL ready for model ingestion (chunker.py)
+CHUNKING = get_env_variable("CHUNKING", "true").lower() == "true"
+CHUNK_MAX_TOKENS = int(
+    get_env_variable("CHUNK_MAX_TOKENS", 512)
+)  # estimated model tokens per chunk
+CHUNK_OVERLAP_TOKENS = int(
+    get_env_variable("CHUNK_OVERLAP_TOKENS", 64)
+)  # estimated tokens repeated at the start of the next chunk
+if CHUNKING and CHUNK_OVERLAP_TOKENS >= CHUNK_MAX_TOKENS:
+    raise ValueError(
+        f"CHUNK_OVERLAP_TOKENS ({CHUNK_OVERLAP_TOKENS}) must be smaller than "
+        f"CHUNK_MAX_TOKENS ({CHUNK_MAX_TOKENS})"
+    )
+
+# Near-duplicate detection over preprocessed tokens (similarity.py)
+NEAR_DUPLICATE_DETECTION = (
+    get_env_variable("NEAR_DUPLICATE_DETECTION", "true").lower() == "true"
+)
+SIMILARITY_INDEX_PATH = get_env_variable(
+    "SIMILARITY_INDEX_PATH", "data/file_processing/similarity.db"
+)
+MINHASH_PERMUTATIONS = int(get_env_variable("MINHASH_PERMUTATIONS", 128))
+MINHASH_SHINGLE_SIZE = int(
+    get_env_variable("MINHASH_SHINGLE_SIZE", 5)
+)  # consecutive tokens per shingle
+LSH_BANDS = int(
+    get_env_variable("LSH_BANDS", 16)
+)  # must divide MINHASH_PERMUTATIONS; more bands find less similar candidates
+NEAR_DUPLICATE_THRESHOLD = float(
+    get_env_variable("NEAR_DUPLICATE_THRESHOLD", 0.8)
+)  # estimated Jaccard similarity at which documents are reported
+
+# Content digests of stored uploads, checked by clients before uploading (blob_index.py)
+BLOB_FOLDER = get_env_variable("BLOB_FOLDER", "data/file_processing/blobs")
+
+# Per-job cProfile/tracemalloc capture, requested on upload with an
+# X-Debug-Profile header by clients sending ADMIN_TOKEN as X-Admin-Token
+ADMIN_TOKEN = get_env_variable("ADMIN_TOKEN")  # unset disables admin features
+PROFILE_FOLDER = get_env_variable("PROFILE_FOLDER", "data/file_processing/profiles")
+PROFILE_TOP_ENTRIES = int(
+    get_env_variable("PROFILE_TOP_ENTRIES", 25)
+)  # functions and allocation sites listed per stage in report.json
@@ -0,0 +1,25 @@
+# fileutils.py
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, encoding="utf-8"):
+    """
+    Open path for writing text through a temporary file that replaces path only
+    once the block completes, so readers (including other processes) never see
+    a partial file. The temporary file is removed if the block raises.
+    """
+    # Unique per writer, so concurrent writers of one path don't share it
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,69 @@
+# gunicorn.conf.py
+"""
+Production server configuration.
+
+    gunicorn -c gunicorn.conf.py
+
+The master process imports the app and preloads NLTK models and stopword sets
+before forking, so workers share that memory copy-on-write and serve their
+first request warm. Send SIGHUP to the master for a graceful reload: new
+workers are forked from the warmed master while old ones finish their
+requests. An exiting worker stops starting queued jobs and gives the ones it
+is running up to PROCESSING_TIMEOUT to complete; anything it leaves behind
+stays in its checkpoint.
+
+Each worker resumes jobs left unfinished by the previous run from their
+checkpoints once it has started; a lock on each checkpoint makes sure only
+one worker picks up a given job.
+
+Processing status is kept in each worker's memory unless JOB_QUEUE_URL is
+set, so SERVER_WORKERS defaults to a single worker (scale with
+SERVER_THREADS) in that case; with several workers clients would have to be
+routed to the worker that accepted their upload.
+"""
+
+import gc
+from config import (
+    SERVER_BIND,
+    SERVER_WORKERS,
+    SERVER_THREADS,
+    SERVER_TIMEOUT,
+    PROCESSING_TIMEOUT,
+)
+
+wsgi_app = "app:app"
+bind = SERVER_BIND
+workers = SERVER_WORKERS
+threads = SERVER_THREADS
+worker_class = "gthread"
+timeout = SERVER_TIMEOUT
+# Time to finish in-flight requests, then to drain running jobs (worker_exit)
+graceful_timeout = SERVER_TIMEOUT + PROCESSING_TIMEOUT
+preload_app = True
+
+
+def when_ready(server):
+    """Warm shared state in the master once the app is loaded, before forking."""
+    from text_preprocessor import warm_up
+
+    warm_up()
+    # Move everything loaded so far out of the GC's tracked generations so
+    # collections in the workers don't touch (and un-share) those pages
+    gc.freeze()
+    server.log.info(f"Master warmed up, forking {workers} workers")
+
+
+def post_worker_init(worker):
+    """Resume jobs interrupted by the last shutdown or crash."""
+    from app import resume_unfinished_jobs
+
+    resume_unfinished_jobs()
+
+
+def worker_exit(server, worker):
+    """Let the worker's running jobs finish before it exits."""
+    from app import job_scheduler
+
+    running = job_scheduler.drain(PROCESSING_TIMEOUT)
+    if running:
+        server.log.warning(f"Worker exiting with {running} jobs unfinished")
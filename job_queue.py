@@ -0,0 +1,302 @@
+# job_queue.py
+"""
+Shared job queue for running processing on standalone workers (worker.py).
+
+Jobs live in a `processing_jobs` table in SQLite (single host, or a shared
+volume) or PostgreSQL. A worker claims a job by taking a lease on it and
+extends the lease with heartbeats while it runs; if the worker dies, the lease
+expires and another worker picks the job up. A failed attempt is retried after
+JOB_RETRY_DELAY until JOB_MAX_ATTEMPTS attempts have been made.
+
+Claims order jobs like the in-process scheduler: by estimated cost with aging
+under "sjf", otherwise in arrival order.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from logging_config import logger
+from sqlite_db import enable_wal, immediate_transaction
+from config import (
+    JOB_QUEUE_URL,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_DELAY,
+    SCHEDULER_POLICY,
+    SCHEDULER_AGING,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processing_jobs (
+    job_id TEXT PRIMARY KEY,
+    filepath TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    cost DOUBLE PRECISION NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    enqueued_at DOUBLE PRECISION NOT NULL,
+    available_at DOUBLE PRECISION NOT NULL,
+    lease_owner TEXT,
+    lease_until DOUBLE PRECISION,
+    progress DOUBLE PRECISION NOT NULL,
+    details TEXT,
+    result TEXT
+)
+"""
+
+_COLUMNS = (
+    "job_id, filepath, payload, cost, state, attempts, max_attempts, "
+    "enqueued_at, available_at, lease_owner, lease_until, progress, details, result"
+)
+
+
+class SQLJobQueue:
+    """Queue operations shared by the SQL backends, written with "?" placeholders."""
+
+    # Appended to the candidate SELECT in claim(), e.g. row locking
+    claim_lock_clause = ""
+
+    def __init__(self, policy=SCHEDULER_POLICY, aging=SCHEDULER_AGING):
+        self.policy = policy
+        self.aging = aging
+        with self._transaction() as cursor:
+            cursor.execute(_SCHEMA)
+
+    def _execute(self, cursor, sql, params=()):
+        cursor.execute(sql, params)
+
+    @contextmanager
+    def _transaction(self):
+        raise NotImplementedError
+
+    def enqueue(self, job_id, filepath, cost, payload, max_attempts=JOB_MAX_ATTEMPTS):
+        """Add a job, replacing any earlier job with the same id."""
+        now = time.time()
+        with self._transaction() as cursor:
+            self._execute(
+                cursor,
+                f"INSERT INTO processing_jobs ({_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, 'queued', 0, ?, ?, ?, NULL, NULL, 0, ?, NULL) "
+                "ON CONFLICT (job_id) DO UPDATE SET filepath = excluded.filepath, "
+                "payload = excluded.payload, cost = excluded.cost, state = 'queued', "
+                "attempts = 0, max_attempts = excluded.max_attempts, "
+                "enqueued_at = excluded.enqueued_at, "
+                "available_at = excluded.available_at, lease_owner = NULL, "
+                "lease_until = NULL, progress = 0, details = excluded.details, "
+                "result = NULL",
+                (
+                    job_id,
+                    filepath,
+                    json.dumps(payload),
+                    cost,
+                    max_attempts,
+                    now,
+                    now,
+                    "Waiting for a worker...",
+                ),
+            )
+        logger.info(f"Enqueued job {job_id} with estimated cost {cost:.1f}")
+
+    def claim(self, worker_id, lease_seconds):
+        """
+        Lease the next runnable job: a queued job whose retry delay has passed,
+        or a running job whose lease has expired.
+        :return: Job dictionary, or None if nothing is runnable
+        """
+        now = time.time()
+        if self.policy == "sjf":
+            order, order_params = "cost - ? * (? - enqueued_at)", (self.aging, now)
+        else:
+            order, order_params = "enqueued_at", ()
+        with self._transaction() as cursor:
+            # Jobs whose worker kept dying are given up on rather than re-leased
+            self._execute(
+                cursor,
+                "UPDATE processing_jobs SET state = 'failed', lease_owner = NULL, "
+                "details = 'Worker lease expired on the final attempt' "
+                "WHERE state = 'running' AND lease_until < ? "
+                "AND attempts >= max_attempts",
+                (now,),
+            )
+            self._execute(
+                cursor,
+                f"SELECT {_COLUMNS} FROM processing_jobs "
+                "WHERE (state = 'queued' AND available_at <= ?) "
+                "OR (state = 'running' AND lease_until < ?) "
+                f"ORDER BY {order} LIMIT 1{self.claim_lock_clause}",
+                (now, now) + order_params,
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            job = dict(zip(_COLUMNS.split(", "), row))
+            if job["state"] == "running":
+                logger.warning(
+                    f"Lease of job {job['job_id']} held by {job['lease_owner']} "
+                    f"expired, re-claiming"
+                )
+            self._execute(
+                cursor,
+                "UPDATE processing_jobs SET state = 'running', "
+                "attempts = attempts + 1, lease_owner = ?, lease_until = ?, "
+                "details = 'Processing...' WHERE job_id = ?",
+                (worker_id, now + lease_seconds, job["job_id"]),
+            )
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds, progress, details):
+        """
+        Extend a lease and record progress.
+        :return: False if the lease was lost to another worker
+        """
+        with self._transaction() as cursor:
+            self._execute(
+                cursor,
+                "UPDATE processing_jobs SET lease_until = ?, progress = ?, "
+                "details = ? WHERE job_id = ? AND lease_owner = ? "
+                "AND state = 'running'",
+                (time.time() + lease_seconds, progress, details, job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        """Record a successful attempt; ignored if the lease was lost."""
+        with self._transaction() as cursor:
+            self._execute(
+                cursor,
+                "UPDATE processing_jobs SET state = 'complete', progress = 100, "
+                "lease_owner = NULL, details = ?, result = ? "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (
+                    f"Processing completed in {result['total_time']:.3f} seconds",
+                    json.dumps(result),
+                    job_id,
+                    worker_id,
+                ),
+            )
+
+    def fail(self, job_id, worker_id, error, retry_delay=JOB_RETRY_DELAY):
+        """
+        Record a failed attempt, re-queueing the job if it has attempts left.
+        :return: True if the job is now permanently failed, False if it was
+            re-queued or the lease was lost
+        """
+        with self._transaction() as cursor:
+            self._execute(
+                cursor,
+                "UPDATE processing_jobs SET "
+                "state = CASE WHEN attempts < max_attempts "
+                "THEN 'queued' ELSE 'failed' END, "
+                "available_at = ?, lease_owner = NULL, details = ? "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (time.time() + retry_delay, error, job_id, worker_id),
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._execute(
+                cursor, "SELECT state FROM processing_jobs WHERE job_id = ?", (job_id,)
+            )
+            return cursor.fetchone()[0] == "failed"
+
+    def get(self, job_id):
+        """Return a job dictionary, or None."""
+        with self._transaction() as cursor:
+            self._execute(
+                cursor,
+                f"SELECT {_COLUMNS} FROM processing_jobs WHERE job_id = ?",
+                (job_id,),
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS.split(", "), row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def status(self, job_id):
+        """
+        Return a job's state in the shape of the web app's processing_status
+        entries, or None if the job is unknown.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job["state"] == "complete":
+            return dict(
+                job["result"], status="complete", progress=100, details=job["details"]
+            )
+        if job["state"] == "failed":
+            return {"status": "error", "progress": 100, "details": job["details"]}
+        return {
+            "status": "processing" if job["state"] == "running" else "queued",
+            "progress": job["progress"],
+            "details": job["details"],
+            "attempts": job["attempts"],
+            "max_attempts": job["max_attempts"],
+        }
+
+
+class SQLiteJobQueue(SQLJobQueue):
+    """
+    Queue in a SQLite database. Claims take the database write lock
+    (BEGIN IMMEDIATE), so concurrent workers on one host never claim the same
+    job.
+    """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        # Lets the web process read status while a worker holds the write lock
+        enable_wal(path)
+        super().__init__(**kwargs)
+
+    def _transaction(self):
+        return immediate_transaction(self.path)
+
+
+class PostgresJobQueue(SQLJobQueue):
+    """
+    Queue in a PostgreSQL table. The claim locks its candidate row with
+    FOR UPDATE SKIP LOCKED, so workers on any number of hosts claim different
+    jobs without waiting on each other.
+    """
+
+    claim_lock_clause = " FOR UPDATE SKIP LOCKED"
+
+    def __init__(self, dsn, **kwargs):
+        import psycopg2  # only needed when a Postgres queue is configured
+
+        self._psycopg2 = psycopg2
+        self.dsn = dsn
+        super().__init__(**kwargs)
+
+    def _execute(self, cursor, sql, params=()):
+        cursor.execute(sql.replace("?", "%s"), params)
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._psycopg2.connect(self.dsn)
+        try:
+            # The connection context manager commits, or rolls back on error
+            with connection, connection.cursor() as cursor:
+                yield cursor
+        finally:
+            connection.close()
+
+
+def open_job_queue(url=JOB_QUEUE_URL):
+    """
+    Open the queue configured by url, or return None when no queue is
+    configured and jobs run in the web process.
+    :param url: "sqlite:///relative.db", "sqlite:////absolute.db" or a
+        "postgresql://" connection URL
+    """
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///") :])
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresJobQueue(url)
+    raise ValueError(f"Unsupported JOB_QUEUE_URL: {url}")
@@ -1,19 +1,178 @@
 # logging_config.py
+import contextvars
+import fcntl
+import json
 import logging
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
 from colorlog import ColoredFormatter
-from config import LOG_DIRECTORY, LOG_LEVEL
+from config import (
+    LOG_DIRECTORY,
+    LOG_LEVEL,
+    LOG_BUFFER_SIZE,
+    LOG_FORMAT,
+    LOG_SAMPLE_EVERY,
+)
 import uuid
 import glob
 
+# Correlation fields attached to every record logged while a job is running.
+# Threads started for a job must run in contextvars.copy_context() to inherit them.
+_job_id = contextvars.ContextVar("job_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+
+@contextmanager
+def job_context(job_id, stage=None):
+    """Tag all records logged inside the block with job_id (and stage)."""
+    job_token = _job_id.set(job_id)
+    stage_token = _stage.set(stage)
+    try:
+        yield
+    finally:
+        _stage.reset(stage_token)
+        _job_id.reset(job_token)
+
+
+def current_job_id():
+    """Return the job_id of the surrounding job_context, or None."""
+    return _job_id.get()
+
+
+def set_log_stage(stage):
+    """Set the pipeline stage reported on records for the rest of the current job."""
+    _stage.set(stage)
+
+
+def should_log_sample(index, total, every=LOG_SAMPLE_EVERY):
+    """Return True for every `every`-th item of a per-page/per-batch loop and the last."""
+    return index % every == 0 or index == total
+
+
+class JobContextFilter(logging.Filter):
+    """Fill job_id, stage and page on each record from extras or the job context."""
+
+    def filter(self, record):
+        if getattr(record, "job_id", None) is None:
+            record.job_id = _job_id.get()
+        if getattr(record, "stage", None) is None:
+            record.stage = _stage.get()
+        if not hasattr(record, "page"):
+            record.page = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "module": record.module,
+            "message": record.getMessage(),
+            "job_id": record.job_id,
+            "stage": record.stage,
+            "page": record.page,
+            "location": f"{record.pathname}:{record.lineno}",
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the last `capacity` formatted records in memory so recent logs can be
+    served without re-reading the log file. Every record gets a sequence number
+    that clients use as a cursor to fetch only lines they have not seen yet.
+    """
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.next_sequence = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        # Handler.handle() already holds self.lock while emit() runs
+        self.records.append((self.next_sequence, getattr(record, "job_id", None), line))
+        self.next_sequence += 1
+
+    def tail(self, cursor=None, job_id=None, limit=200):
+        """
+        Return buffered lines recorded at or after cursor.
+        :param cursor: Sequence number returned by the previous call, or None for
+            the most recent lines
+        :param job_id: Only return records logged for this job
+        :param limit: Maximum number of lines to return
+        :return: Tuple of (lines, next_cursor)
+        """
+        with self.lock:
+            if cursor is None or not self.records:
+                start = 0
+            else:
+                start = max(0, cursor - self.records[0][0])
+            records = [
+                (sequence, line)
+                for sequence, record_job_id, line in islice(self.records, start, None)
+                if job_id is None or record_job_id == job_id
+            ]
+            next_cursor = self.next_sequence
+        if cursor is None:
+            records = records[-limit:]
+        elif len(records) > limit:
+            records = records[:limit]
+            next_cursor = records[-1][0] + 1
+        return [line for _, line in records], next_cursor
+
+
+# In-memory tail of the application log, served by the /latest_logs endpoint
+log_buffer = RingBufferHandler(LOG_BUFFER_SIZE)
+
+
+# Open lock file of this process's log. The lock is held for the life of the
+# process and tells other processes' cleanup that the log is still in use.
+_log_owner_lock = None
+
+
+def _claim_log(run_id):
+    global _log_owner_lock
+    _log_owner_lock = open(os.path.join(LOG_DIRECTORY, f"app_{run_id}.lock"), "w")
+    fcntl.lockf(_log_owner_lock, fcntl.LOCK_EX)
+
+
+def _log_in_use(log_file):
+    """Tell whether a live process still holds the lock of a log file."""
+    try:
+        fd = os.open(log_file[: -len(".log")] + ".lock", os.O_WRONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        # Also releases the lock if it was just taken
+        os.close(fd)
+    return False
+
 
 def cleanup_old_logs(current_run_id):
     """
     Deletes old log files that are not associated with the current server run.
-    Keeps only the log files related to the current run, identified by current_run_id.
+    Logs of other processes that are still running (a server, worker or batch
+    job sharing LOG_DIRECTORY) are kept.
     """
     for log_file in glob.glob(os.path.join(LOG_DIRECTORY, "app_*.log")):
-        if current_run_id not in log_file:
+        if current_run_id not in log_file and not _log_in_use(log_file):
             try:
                 os.remove(log_file)
                 print(
@@ -21,6 +180,10 @@ def cleanup_old_logs(current_run_id):
                 )  # Use print as logging might not be set up yet
             except OSError as e:
                 print(f"Error deleting file {log_file}: {e}")
+            try:
+                os.remove(log_file[: -len(".log")] + ".lock")
+            except OSError:
+                pass
 
 
 def setup_logging():
@@ -32,9 +195,17 @@ def setup_logging():
     log_filename = f"app_{current_run_id}.log"
 
     print(f"Log file will be: {log_filename}")
+    # Claimed before the log file exists, so no cleanup sees it unclaimed
+    _claim_log(current_run_id)
 
-    # Remove old logs not connected to the current server run
-    cleanup_old_logs(current_run_id)
+    # Remove old logs not connected to the current server run. This globs and
+    # deletes files, so it runs in the background instead of on the import path.
+    threading.Thread(
+        target=cleanup_old_logs,
+        args=(current_run_id,),
+        name="log-cleanup",
+        daemon=True,
+    ).start()
 
     formatter = ColoredFormatter(
         "%(log_color)s%(asctime)s %(levelname)s [%(module)s]: %(message)s [in %(pathname)s:%(lineno)d]",
@@ -49,22 +220,33 @@ def setup_logging():
     )
 
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else formatter)
     console_handler.setLevel(getattr(logging, LOG_LEVEL))
 
     file_handler = logging.FileHandler(os.path.join(LOG_DIRECTORY, log_filename))
     file_handler.setFormatter(
-        logging.Formatter(
+        JsonFormatter()
+        if LOG_FORMAT == "json"
+        else logging.Formatter(
             "%(asctime)s %(levelname)s [%(module)s]: %(message)s [in %(pathname)s:%(lineno)d]",
             "%m-%d %H:%M:%S",
         )
     )
     file_handler.setLevel(getattr(logging, LOG_LEVEL))
 
+    log_buffer.setFormatter(
+        logging.Formatter(
+            "%(asctime)s %(levelname)s [%(module)s]: %(message)s", "%m-%d %H:%M:%S"
+        )
+    )
+    log_buffer.setLevel(getattr(logging, LOG_LEVEL))
+
     logger_setup = logging.getLogger(__name__)
     logger_setup.setLevel(getattr(logging, LOG_LEVEL))
+    logger_setup.addFilter(JobContextFilter())
     logger_setup.addHandler(console_handler)
     logger_setup.addHandler(file_handler)
+    logger_setup.addHandler(log_buffer)
 
     return logger_setup
 
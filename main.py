@@ -1,6 +1,9 @@
+import argparse
+import subprocess
 import sys
 import os
-from app import app
+import time
+from app import app, resume_unfinished_jobs
 from logging_config import logger
 
 # Use the logger from LoggerManager
@@ -10,8 +13,54 @@ logger.info(f"Current working directory: {os.getcwd()}")
 logger.info(f"PYTHONPATH: {os.environ.get('PYTHONPATH', 'Not set')}")
 
 
+def startup_report(module="app", top=25):
+    """
+    Import a module in a fresh interpreter with `-X importtime` and print the
+    slowest imports by cumulative time.
+    :param module: Module to import
+    :param top: Number of entries to print
+    """
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.perf_counter() - start_time
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    print(f"Importing '{module}' took {wall_time:.3f}s (interpreter start included)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(entries, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f} {name}")
+    if result.returncode != 0:
+        print(f"Import failed:\n{result.stderr.splitlines()[-1]}")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PDF processing server.")
+    parser.add_argument(
+        "--startup-report",
+        nargs="?",
+        const="app",
+        metavar="MODULE",
+        help="Print an import-time breakdown for MODULE (default: app) and exit",
+    )
+    args = parser.parse_args()
+    if args.startup_report:
+        startup_report(args.startup_report)
+        sys.exit(0)
+
     print("About to start Flask app...")
+    # With the reloader, only the child process that serves requests runs jobs
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        resume_unfinished_jobs()
     try:
         app.run(host="0.0.0.0", port=5001, debug=True)
     except Exception as e:
@@ -1,51 +1,651 @@
-import PyPDF2
-from logging_config import logger
+import bisect
+import contextvars
+import hashlib
+import itertools
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 
+from logging_config import logger, should_log_sample
+from stage_executors import process_context
+from config import (
+    CLEAN_PAGE_TEXT,
+    STRIP_REPEATED_LINES,
+    REPEATED_LINE_THRESHOLD,
+    REPEATED_LINE_EDGE,
+    EXTRACTION_ISOLATE_PAGES,
+    PAGE_TIMEOUT,
+    PAGE_MEMORY_LIMIT_MB,
+    SKIP_IMAGE_ONLY_PAGES,
+    FONT_CACHE,
+    SHARED_FONT_CACHE_SIZE,
+    CHECKPOINT_INTERVAL_PAGES,
+)
 
-def extract_text_from_pdf(file_path, progress_callback=None, flask_app=None):
+# Text-showing operators: Tj and TJ, or ' and " following a string operand
+_TEXT_OPERATOR_RE = re.compile(rb"\bT[jJ]\b|[)>\]]\s*['\"]")
+# Page numbers a running header or footer may carry: "Page 3", "page 3 of 10",
+# or a line holding nothing but the number ("3", "- 3 -", "3/10")
+_PAGE_NUMBER_RE = re.compile(
+    r"\bpage\s*\d+(?:\s*(?:of|/)\s*\d+)?|^\W*\d+(?:\s*(?:of|/)\s*\d+)?\W*$",
+    re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+# Start of an indirect object definition, capturing its first value byte
+_OBJECT_START_RE = re.compile(rb"\s*\d+\s+\d+\s+obj\s*(\S)")
+
+
+def _line_key(line):
+    """
+    Hash a line so that page numbers and spacing differences still match.
+    Other digits are kept, so lines differing only in their numbers (table
+    rows, say) are not mistaken for a running header.
+    """
+    return hash(_WHITESPACE_RE.sub(" ", _PAGE_NUMBER_RE.sub("#", line)).strip().lower())
+
+
+def strip_repeated_lines(
+    pages, threshold=REPEATED_LINE_THRESHOLD, edge_lines=REPEATED_LINE_EDGE
+):
+    """
+    Remove running headers, footers and page numbers from extracted page texts.
+    Only the first and last edge_lines lines of each page are considered; a line
+    recurring on at least threshold of the pages is treated as boilerplate.
+    :param pages: List of page texts
+    :param threshold: Fraction of pages a line must appear on to be stripped
+    :param edge_lines: Number of lines checked at the top and bottom of each page
+    :return: List of page texts with boilerplate lines removed
+    """
+    if len(pages) < 3:
+        return pages
+
+    # Line ends are kept, so a page still ends in the line break that separates
+    # it from the next page once the pages are joined
+    page_lines = [page.splitlines(keepends=True) for page in pages]
+    counts = Counter()
+    for lines in page_lines:
+        edges = lines[:edge_lines] + lines[-edge_lines:]
+        counts.update({_line_key(line) for line in edges if line.strip()})
+
+    min_count = max(2, threshold * len(pages))
+    repeated = {key for key, count in counts.items() if count >= min_count}
+    if not repeated:
+        return pages
+
+    stripped_pages = []
+    removed = 0
+    for lines in page_lines:
+        edge_indexes = set(range(min(edge_lines, len(lines))))
+        edge_indexes.update(range(max(0, len(lines) - edge_lines), len(lines)))
+        kept = [
+            line
+            for index, line in enumerate(lines)
+            if index not in edge_indexes or _line_key(line) not in repeated
+        ]
+        removed += len(lines) - len(kept)
+        stripped_pages.append("".join(kept))
+    logger.info(
+        f"Stripped {removed} repeated header/footer lines across {len(pages)} pages"
+    )
+    return stripped_pages
+
+
+# Characters NFKC leaves alone that still split or disguise tokens. NFKC itself
+# expands ligatures such as "\ufb01" and turns no-break and typographic spaces
+# into plain spaces.
+_CLEANUP_TABLE = str.maketrans(
+    {
+        "\u00ad": None,  # soft hyphen
+        "\u200b": None,  # zero-width space
+        "\u200c": None,  # zero-width non-joiner
+        "\u200d": None,  # zero-width joiner
+        "\u2060": None,  # word joiner
+        "\ufeff": None,  # byte order mark / zero-width no-break space
+        "\t": " ",
+        "\x0b": "\n",
+        "\x0c": "\n",
+        "\x85": "\n",
+        "\u2028": "\n",
+        "\u2029": "\n",
+        "\u2010": "-",  # hyphen (NFKC maps the non-breaking hyphen to this)
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+    }
+)
+# One scan for every whitespace repair: a word hyphenated across a line end,
+# a line break with its surrounding spaces, or a run of spaces
+_CLEANUP_RE = re.compile(
+    r"(?<=\w)- *(?:\r\n?|\n) *(?P<tail>[^\W\d_]\w*)"
+    r"|(?P<newline> *(?:\r\n?|\n) *)"
+    r"| {2,}"
+)
+_WORD_RE = re.compile(r"\w+")
+# The word before a hyphen, searched for in a window ending at the hyphen
+_WORD_END_RE = re.compile(r"\w+\Z")
+
+
+def clean_page_text(text):
+    """
+    Normalize extracted page text before tokenization: NFKC (which also
+    expands ligatures), removal of soft hyphens and zero-width characters,
+    ASCII quotes and hyphens, rejoining words hyphenated across line ends and
+    collapsing runs of spaces. Line breaks are kept for strip_repeated_lines.
+    """
+    if not text.isascii() and not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    text = text.translate(_CLEANUP_TABLE)
+    vocabulary = None
+
+    def replacement(match):
+        nonlocal vocabulary
+        tail = match.group("tail")
+        if tail is None:
+            return "\n" if match.group("newline") is not None else " "
+        # "exam-\nple" is joined only if "example" appears elsewhere on the
+        # page; otherwise the hyphen may be real ("well-\nknown", "Anglo-\nSaxon")
+        # and only the line break goes
+        if vocabulary is None:
+            vocabulary = set(_WORD_RE.findall(text.lower()))
+        start = match.start()
+        head = _WORD_END_RE.search(text, max(0, start - 64), start).group()
+        if (head + tail).lower() in vocabulary:
+            return tail
+        return f"-{tail}"
+
+    return _CLEANUP_RE.sub(replacement, text)
+
+
+# Per-document font cache for the extraction running in the current context:
+# {"maps": {(idnum, generation, space_width): char_map}, "hits": n, "shared": n}
+_document_fonts = contextvars.ContextVar("document_fonts", default=None)
+# Char maps shared across documents, keyed by embedded font fingerprint
+_shared_fonts = OrderedDict()
+_shared_fonts_lock = threading.Lock()
+# PyPDF2's own build_char_map, captured when it is first patched
+_build_char_map = None
+_patch_lock = threading.Lock()
+
+
+def _font_fingerprint(font):
+    """
+    Hash the parts of an embedded font that determine its character maps, or
+    return None if the font is not embedded (and so not safely shareable).
+    """
+    descriptor = font["/FontDescriptor"] if "/FontDescriptor" in font else None
+    if descriptor is None and "/DescendantFonts" in font:
+        descendant = font["/DescendantFonts"][0].get_object()
+        if "/FontDescriptor" in descendant:
+            descriptor = descendant["/FontDescriptor"]
+    if descriptor is None:
+        return None
+    font_files = [
+        descriptor[key]
+        for key in ("/FontFile", "/FontFile2", "/FontFile3")
+        if key in descriptor
+    ]
+    if not font_files:
+        return None
+
+    digest = hashlib.sha1()
+    for stream in font_files:
+        digest.update(stream._data)
+    if "/ToUnicode" in font:
+        digest.update(font["/ToUnicode"]._data)
+    for key in ("/BaseFont", "/Subtype", "/Encoding", "/FirstChar", "/Widths"):
+        if key in font:
+            digest.update(repr(font[key]).encode())
+    if "/DescendantFonts" in font:
+        descendant = font["/DescendantFonts"][0].get_object()
+        for key in ("/W", "/DW"):
+            if key in descendant:
+                digest.update(repr(descendant[key]).encode())
+    return digest.hexdigest()
+
+
+def _cached_build_char_map(font_name, space_width, obj):
+    """
+    Stand-in for PyPDF2's build_char_map that reuses char maps already built for
+    the same font object in this document (and, optionally, in other documents).
+    """
+    cache = _document_fonts.get()
+    if cache is None:
+        return _build_char_map(font_name, space_width, obj)
+    try:
+        font_ref = obj["/Resources"]["/Font"].raw_get(font_name)
+        key = (font_ref.idnum, font_ref.generation, space_width)
+    except (AttributeError, KeyError):
+        # Fonts defined inline in the resources have no reference to key on
+        return _build_char_map(font_name, space_width, obj)
+
+    char_map = cache["maps"].get(key)
+    if char_map is not None:
+        cache["hits"] += 1
+        return char_map
+
+    fingerprint = None
+    if SHARED_FONT_CACHE_SIZE:
+        font = font_ref.get_object()
+        try:
+            fingerprint = _font_fingerprint(font)
+        except Exception:
+            fingerprint = None
+        if fingerprint is not None:
+            with _shared_fonts_lock:
+                shared = _shared_fonts.get((fingerprint, space_width))
+                if shared is not None:
+                    _shared_fonts.move_to_end((fingerprint, space_width))
+            if shared is not None:
+                # Reuse the maps but hand back this document's font dictionary
+                char_map = shared[:4] + (font,)
+                cache["maps"][key] = char_map
+                cache["shared"] += 1
+                return char_map
+
+    char_map = _build_char_map(font_name, space_width, obj)
+    cache["maps"][key] = char_map
+    if fingerprint is not None:
+        with _shared_fonts_lock:
+            _shared_fonts[(fingerprint, space_width)] = char_map
+            while len(_shared_fonts) > SHARED_FONT_CACHE_SIZE:
+                _shared_fonts.popitem(last=False)
+    return char_map
+
+
+@contextmanager
+def document_font_cache():
+    """
+    Cache decoded font/ToUnicode maps by indirect reference while a document is
+    extracted. PyPDF2 rebuilds them from the page resources for every page, which
+    dominates extraction time for long documents that reuse a few fonts.
+    """
+    global _build_char_map
+    if not FONT_CACHE:
+        yield None
+        return
+
+    import PyPDF2._page
+
+    with _patch_lock:
+        # Patched once; without an active cache the wrapper calls straight through
+        if PyPDF2._page.build_char_map is not _cached_build_char_map:
+            _build_char_map = PyPDF2._page.build_char_map
+            PyPDF2._page.build_char_map = _cached_build_char_map
+
+    cache = {"maps": {}, "hits": 0, "shared": 0}
+    token = _document_fonts.set(cache)
+    try:
+        yield cache
+    finally:
+        _document_fonts.reset(token)
+
+
+def page_has_text(page):
+    """
+    Cheaply check whether a page can contain text, without running the extractor.
+    Scans the decoded content stream for text-showing operators. Pages that draw
+    form XObjects are assumed to have text, since the form may contain it.
+    :param page: PyPDF2 page object
+    :return: False if the page is image-only or empty
+    """
+    try:
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources else None
+        if xobjects:
+            for xobject in xobjects.get_object().values():
+                if xobject.get_object().get("/Subtype") == "/Form":
+                    return True
+
+        contents = page.get("/Contents")
+        if contents is None:
+            return False
+        contents = contents.get_object()
+        streams = contents if isinstance(contents, list) else [contents]
+        return any(
+            _TEXT_OPERATOR_RE.search(stream.get_object().get_data())
+            for stream in streams
+        )
+    except Exception:
+        # If the pre-scan can't decide, let the full extractor look at the page
+        return True
+
+
+def _extract_page(page, skip_image_only):
+    """Return the page text, or None if the page was skipped as image-only."""
+    if skip_image_only and not page_has_text(page):
+        return None
+    text = page.extract_text()
+    return clean_page_text(text) if CLEAN_PAGE_TEXT else text
+
+
+def _iter_page_texts(pdf_reader, skip_image_only, start_page=1):
+    """
+    Yield (page_num, text, error) for each page from start_page on, extracting
+    in this process. text is None for pages skipped as image-only.
+    """
+    with document_font_cache() as font_cache:
+        for page_num in range(start_page, len(pdf_reader.pages) + 1):
+            page = pdf_reader.pages[page_num - 1]
+            try:
+                page_text = _extract_page(page, skip_image_only)
+            except Exception as e:
+                yield page_num, None, str(e)
+                continue
+            yield page_num, page_text, None
+        if font_cache is not None:
+            logger.info(
+                f"Font cache: {len(font_cache['maps'])} fonts "
+                f"({font_cache['shared']} from other documents), "
+                f"{font_cache['hits']} reused"
+            )
+
+
+def _address_space_size():
+    """Return this process's current virtual memory size in bytes, or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _isolated_extraction_worker(
+    file_path, start_page, memory_limit_mb, skip_image_only, conn
+):
+    """Subprocess entry point: extract pages from start_page on, sending each result."""
+    import PyPDF2
+
+    if memory_limit_mb:
+        import resource
+
+        # The forked child starts with the parent's address space, so the
+        # budget is added on top of what is already mapped
+        limit = _address_space_size() + memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    with open(file_path, "rb") as file, document_font_cache():
+        pdf_reader = PyPDF2.PdfReader(file)
+        for index in range(start_page - 1, len(pdf_reader.pages)):
+            try:
+                page_text = _extract_page(pdf_reader.pages[index], skip_image_only)
+                conn.send((index + 1, page_text, None))
+            except Exception as e:
+                conn.send((index + 1, None, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+def _iter_isolated_page_texts(
+    file_path, num_pages, page_timeout, memory_limit_mb, skip_image_only, start_page=1
+):
+    """
+    Yield (page_num, text, error) for each page from start_page on, extracting in a supervised
+    subprocess. A page that exceeds page_timeout or kills the subprocess (for
+    example by exceeding memory_limit_mb) is reported as an error, and a new
+    subprocess resumes from the following page.
+    """
+    context = process_context()
+    next_page = start_page
+    while next_page <= num_pages:
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_isolated_extraction_worker,
+            args=(file_path, next_page, memory_limit_mb, skip_image_only, child_conn),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        try:
+            while next_page <= num_pages:
+                if not parent_conn.poll(page_timeout):
+                    yield next_page, None, f"timed out after {page_timeout} seconds"
+                    next_page += 1
+                    break
+                try:
+                    page_num, page_text, error = parent_conn.recv()
+                except EOFError:
+                    yield next_page, None, "extraction process exited unexpectedly"
+                    next_page += 1
+                    break
+                yield page_num, page_text, error
+                next_page = page_num + 1
+        finally:
+            process.kill()
+            process.join()
+            parent_conn.close()
+
+
+def _object_sizes(pdf_reader, file_size):
+    """
+    Build a lookup estimating each object's size in bytes from the xref table.
+    Objects are laid out back to back, so the gap to the next object's offset
+    approximates an object's length without reading it.
+    """
+    offsets = sorted(
+        offset for entries in pdf_reader.xref.values() for offset in entries.values()
+    )
+    offsets.append(file_size)
+
+    def object_size(idnum, generation):
+        offset = pdf_reader.xref.get(generation, {}).get(idnum)
+        if offset is None:
+            return 0
+        return offsets[bisect.bisect_right(offsets, offset)] - offset
+
+    return object_size
+
+
+def _is_array_object(pdf_reader, ref):
+    """
+    Tell whether an indirect object is an array by peeking at the bytes at its
+    xref offset, without parsing it. Objects held in object streams have no
+    offset and cannot be streams, so they are reported as arrays.
+    """
+    offset = pdf_reader.xref.get(ref.generation, {}).get(ref.idnum)
+    if offset is None:
+        return True
+    stream = pdf_reader.stream
+    position = stream.tell()
+    try:
+        stream.seek(offset)
+        match = _OBJECT_START_RE.match(stream.read(64))
+    finally:
+        stream.seek(position)
+    return match is not None and match.group(1) == b"["
+
+
+def inspect_pdf(file, file_size):
+    """
+    Read document metadata without parsing or decoding any page content.
+    Only the trailer, xref table, info dictionary and page tree are read; the
+    size of each page's content streams is estimated from xref offsets.
+    :param file: Path or seekable binary file object
+    :param file_size: Size of the file in bytes
+    :return: Dictionary with page count, document info, encryption status and
+        approximate content size per page
+    """
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(file)
+    encrypted = pdf_reader.is_encrypted
+    if encrypted and not pdf_reader.decrypt(""):
+        return {"encrypted": True, "page_count": None, "file_size": file_size}
+
+    object_size = _object_sizes(pdf_reader, file_size)
+    page_content_bytes = []
+    for page in pdf_reader.pages:
+        contents = page.raw_get("/Contents") if "/Contents" in page else None
+        if isinstance(contents, PyPDF2.generic.IndirectObject):
+            # An indirect array of streams is resolved; streams themselves are not
+            if _is_array_object(pdf_reader, contents):
+                refs = contents.get_object()
+            else:
+                refs = [contents]
+        else:
+            refs = contents or []
+        page_content_bytes.append(
+            sum(object_size(ref.idnum, ref.generation) for ref in refs)
+        )
+
+    page_count = len(page_content_bytes)
+    content_bytes = sum(page_content_bytes)
+    return {
+        "encrypted": encrypted,
+        "page_count": page_count,
+        "file_size": file_size,
+        "pdf_header": pdf_reader.pdf_header,
+        "info": {
+            key.lstrip("/"): str(value)
+            for key, value in (pdf_reader.metadata or {}).items()
+        },
+        "content_bytes": content_bytes,
+        "content_bytes_per_page": content_bytes / page_count if page_count else 0,
+        "page_content_bytes": page_content_bytes,
+    }
+
+
+def estimate_job_cost(inspection):
+    """
+    Estimate the relative cost of processing a document from inspect_pdf output.
+    One unit per page plus one per 8KB of (compressed) content stream.
+    """
+    if not inspection.get("page_count"):
+        return inspection.get("file_size", 0) / 8192
+    return inspection["page_count"] + inspection["content_bytes"] / 8192
+
+
+def extract_text_from_pdf(
+    file_path,
+    progress_callback=None,
+    flask_app=None,
+    stats=None,
+    isolate_pages=None,
+    checkpoint=None,
+):
     """
     Extract text from a PDF file with page-by-page progress updates and error handling.
     :param file_path: Path to the PDF file
     :param progress_callback: Function to call with progress updates
     :param flask_app: Flask application instance for logging
+    :param stats: Optional dictionary filled with extraction details: pages
+        skipped due to errors and why, pages skipped as image-only, and the
+        (page_num, offset) at which each page's text starts, and the number
+        of pages resumed from the checkpoint
+    :param isolate_pages: Extract pages in a supervised subprocess with a
+        per-page time and memory budget (defaults to EXTRACTION_ISOLATE_PAGES)
+    :param checkpoint: Optional checkpoints.JobCheckpoint; pages already saved
+        in it are not extracted again, and new pages are saved every
+        CHECKPOINT_INTERVAL_PAGES pages
     :return: Extracted text as a string
     """
 
+    import PyPDF2  # deferred so importing this module stays cheap
+
+    if isolate_pages is None:
+        isolate_pages = EXTRACTION_ISOLATE_PAGES
+    if stats is None:
+        stats = {}
+    skipped_pages = stats.setdefault("skipped_pages", [])
+    image_only_pages = stats.setdefault("image_only_pages", [])
+    page_offsets = stats.setdefault("page_offsets", [])
+    stats["resumed_pages"] = 0
+
     logger.info(f"Starting text extraction from PDF: {file_path}")
     text_parts = []
+    text_pages = []
     try:
         with open(file_path, "rb") as file:
             logger.info("PDF file opened successfully")
             pdf_reader = PyPDF2.PdfReader(file)
             num_pages = len(pdf_reader.pages)
             logger.info(f"PDF has {num_pages} pages")
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                logger.info(f"Extracting text from page {page_num}/{num_pages}")
-                try:
-                    if page_text := page.extract_text():
+            resumed_pages = checkpoint.load_pages() if checkpoint else []
+            start_page = len(resumed_pages) + 1
+            stats["resumed_pages"] = len(resumed_pages)
+            if resumed_pages:
+                logger.info(f"Resuming extraction from checkpoint at page {start_page}")
+            if isolate_pages:
+                logger.info(
+                    f"Extracting pages in a subprocess, {PAGE_TIMEOUT}s and "
+                    f"{PAGE_MEMORY_LIMIT_MB}MB budget per page"
+                )
+                page_texts = _iter_isolated_page_texts(
+                    file_path,
+                    num_pages,
+                    PAGE_TIMEOUT,
+                    PAGE_MEMORY_LIMIT_MB,
+                    SKIP_IMAGE_ONLY_PAGES,
+                    start_page,
+                )
+            else:
+                page_texts = _iter_page_texts(
+                    pdf_reader, SKIP_IMAGE_ONLY_PAGES, start_page
+                )
+
+            sample_chars = 0
+            sample_start = 1
+            unsaved_pages = []
+            for page_num, page_text, error in itertools.chain(
+                resumed_pages, page_texts
+            ):
+                if checkpoint and page_num >= start_page:
+                    unsaved_pages.append((page_num, page_text, error))
+                    if (
+                        len(unsaved_pages) >= CHECKPOINT_INTERVAL_PAGES
+                        or page_num == num_pages
+                    ):
+                        checkpoint.save_pages(unsaved_pages)
+                        unsaved_pages = []
+                if error is None and page_text is None:
+                    image_only_pages.append(page_num)
+                elif error is None:
+                    if page_text:
                         text_parts.append(page_text)
-                        logger.info(
-                            f"Extracted {len(page_text)} characters from page {page_num}"
-                        )
-                    if progress_callback:
-                        try:
-                            progress = (page_num / num_pages) * 100
-                            progress_callback(progress)
-                        except Exception as progress_callback_error:
-                            logger.error(
-                                f"Error in progress_callback: {str(progress_callback_error)}"
-                            )
-                    # Add more granular progress updates
-                    if page_num % 5 == 0 or page_num == num_pages:
-                        logger.info(
-                            f"Extraction progress: {progress:.2f}% ({page_num}/{num_pages} pages)"
-                        )
-                except Exception as e:
+                        text_pages.append(page_num)
+                        sample_chars += len(page_text)
+                else:
                     logger.error(
-                        f"Error extracting text from page {page_num}: {str(e)}"
+                        f"Error extracting text from page {page_num}: {error}",
+                        extra={"page": page_num},
                     )
                     # Continue with the next page, but log the error
-                    logger.warning(f"Skipping page {page_num} due to extraction error")
+                    logger.warning(
+                        f"Skipping page {page_num} due to extraction error",
+                        extra={"page": page_num},
+                    )
+                    skipped_pages.append({"page": page_num, "reason": error})
+
+                progress = (page_num / num_pages) * 100
+                if progress_callback:
+                    try:
+                        progress_callback(progress)
+                    except Exception as progress_callback_error:
+                        logger.error(
+                            f"Error in progress_callback: {str(progress_callback_error)}"
+                        )
+                # Summarize per-page work every LOG_SAMPLE_EVERY pages
+                if should_log_sample(page_num, num_pages):
+                    logger.info(
+                        f"Extracted {sample_chars} characters from pages "
+                        f"{sample_start}-{page_num} ({page_num}/{num_pages} pages)",
+                        extra={"page": page_num},
+                    )
+                    sample_chars = 0
+                    sample_start = page_num + 1
+            if image_only_pages:
+                logger.info(
+                    f"Skipped {len(image_only_pages)} image-only or empty pages "
+                    f"without running the text extractor"
+                )
+            if STRIP_REPEATED_LINES:
+                text_parts = strip_repeated_lines(text_parts)
+            offset = 0
+            for page_num, page_text in zip(text_pages, text_parts):
+                page_offsets.append((page_num, offset))
+                offset += len(page_text)
             full_text = "".join(text_parts)
             logger.info(
                 f"Text extraction complete. Total characters extracted: {len(full_text)}"
@@ -0,0 +1,298 @@
+# pipeline.py
+import hashlib
+import os
+import sqlite3
+import time
+from pdf_processor import extract_text_from_pdf
+from text_preprocessor import preprocess_text, count_tokens, token_count_method
+from chunker import write_chunks
+from similarity import minhash_signature
+from config import CHUNKING, FEATURE_VECTORS
+from logging_config import logger, job_context, set_log_stage
+
+
+def file_sha256(filepath, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Chunk size of blob_digest(); must match BLOB_CHUNK_SIZE in templates/upload.html
+BLOB_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def blob_digest(filepath):
+    """
+    Return the content digest used by /blobs: the hex SHA-256 of the
+    concatenated SHA-256 digests of each BLOB_CHUNK_SIZE chunk. Browsers can
+    only hash whole buffers with Web Crypto, so hashing per chunk lets them
+    compute it without loading the whole file into memory.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(BLOB_CHUNK_SIZE):
+            digest.update(hashlib.sha256(chunk).digest())
+    return digest.hexdigest()
+
+
+def processed_filename_for(filename):
+    """Return the name of the processed text file for an uploaded PDF."""
+    return f"processed_{filename}.txt"
+
+
+def chunks_filename_for(filename):
+    """Return the name of the JSONL chunks file for an uploaded PDF."""
+    return f"chunks_{filename}.jsonl"
+
+
+def extract_document(filepath, checkpoint=None, progress_callback=None):
+    """
+    Extract the text of a PDF.
+    :param checkpoint: Optional checkpoints.JobCheckpoint to resume from and save to
+    :return: Tuple of (raw_text, extraction stats dictionary), the stats
+        including the model token count of the text
+    """
+    extraction_stats = {}
+    raw_text = extract_text_from_pdf(
+        filepath, progress_callback, stats=extraction_stats, checkpoint=checkpoint
+    )
+    extraction_stats["token_count"] = count_tokens(raw_text)
+    extraction_stats["token_count_method"] = token_count_method()
+    return raw_text, extraction_stats
+
+
+def features_filename_for(filename):
+    """Return the name of the hashed term-frequency vector file for an uploaded PDF."""
+    return f"features_{filename}.npz"
+
+
+def preprocess_document(raw_text, progress_callback=None):
+    """
+    Preprocess extracted text.
+    :return: Tuple of (processed_text, hashed term frequencies dictionary or
+        None when FEATURE_VECTORS is off)
+    """
+    features = {} if FEATURE_VECTORS else None
+    processed_text = preprocess_text(raw_text, progress_callback, features=features)
+    return processed_text, features
+
+
+def chunk_document(raw_text, page_offsets, filepath, progress_callback=None):
+    """
+    Write the JSONL chunks of extracted text to filepath and return their
+    count. CPU-bound, so web jobs run it as a "chunk" stage; progress_callback
+    is accepted for that calling convention and not used.
+    """
+    return write_chunks(raw_text, filepath, page_offsets)
+
+
+def save_text(text, filepath):
+    """Write processed text to filepath, creating its folder if needed."""
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def save_features(features, filepath):
+    """Write hashed term frequencies as an uncompressed .npz of sparse arrays."""
+    import numpy as np
+
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    np.savez(
+        filepath,
+        dimension=features["dimension"],
+        indices=features["indices"],
+        values=features["values"],
+    )
+
+
+def minhash_document(processed_text, num_perm, progress_callback=None):
+    """
+    Compute the MinHash signature of preprocessed text for
+    find_near_duplicates(). CPU-bound, so web jobs run it as a "minhash" stage;
+    progress_callback is accepted for that calling convention and not used.
+    :return: Tuple of (signature or None, token count)
+    """
+    tokens = processed_text.split()
+    return minhash_signature(tokens, num_perm), len(tokens)
+
+
+def find_near_duplicates(similarity_index, job_id, signature, token_count):
+    """
+    Add a document's signature from minhash_document() to the similarity
+    index and return its near-duplicates, or None if the index could not be
+    updated; a broken index does not fail the job.
+    """
+    try:
+        return similarity_index.add_signature(job_id, signature, token_count)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Could not update the similarity index: {str(e)}")
+        return None
+
+
+def save_document(
+    run_stage,
+    filename,
+    output_folder,
+    raw_text,
+    page_offsets,
+    processed_text,
+    features,
+    similarity_index=None,
+):
+    """
+    Run the save stage of a job: write the processed text and, as enabled, the
+    chunks and feature vector, and index the document for near-duplicates.
+    :param run_stage: Callable(stage, func, *args) running func as that stage
+    :param filename: Uploaded file name, also the job id in the similarity index
+    :return: Dictionary with the processed file name and path, chunks file
+        name and count, features file name and near-duplicates
+    """
+    processed_filename = processed_filename_for(filename)
+    processed_filepath = os.path.join(output_folder, processed_filename)
+    run_stage("save", save_text, processed_text, processed_filepath)
+    chunks_filename = chunk_count = None
+    if CHUNKING:
+        chunks_filename = chunks_filename_for(filename)
+        chunk_count = run_stage(
+            "chunk",
+            chunk_document,
+            raw_text,
+            page_offsets,
+            os.path.join(output_folder, chunks_filename),
+        )
+    features_filename = None
+    if features is not None:
+        features_filename = features_filename_for(filename)
+        run_stage(
+            "save",
+            save_features,
+            features,
+            os.path.join(output_folder, features_filename),
+        )
+    near_duplicates = None
+    if similarity_index is not None:
+        signature, token_count = run_stage(
+            "minhash", minhash_document, processed_text, similarity_index.num_perm
+        )
+        near_duplicates = run_stage(
+            "save",
+            find_near_duplicates,
+            similarity_index,
+            filename,
+            signature,
+            token_count,
+        )
+    return {
+        "filename": processed_filename,
+        "processed_file_path": processed_filepath,
+        "chunks_filename": chunks_filename,
+        "chunk_count": chunk_count,
+        "features_filename": features_filename,
+        "near_duplicates": near_duplicates,
+    }
+
+
+def _stage_callback(progress_callback, stage):
+    if progress_callback is None:
+        return None
+    return lambda progress: progress_callback(stage, progress)
+
+
+def process_document(
+    filepath,
+    output_folder,
+    progress_callback=None,
+    checkpoint=None,
+    similarity_index=None,
+    profiler=None,
+):
+    """
+    Run the extract -> preprocess -> save pipeline for one PDF outside Flask.
+    :param filepath: Path to the PDF file
+    :param output_folder: Folder the processed text file is written to
+    :param progress_callback: Function called with (stage, progress) updates
+    :param checkpoint: Optional checkpoints.JobCheckpoint to resume extraction from
+    :param similarity_index: Optional similarity.SimilarityIndex to add the
+        document to, reporting the near-duplicates it finds
+    :param profiler: Optional profiling.JobProfiler to run each stage call under
+    :return: Dictionary with the output path, sizes and stage timings
+    """
+    with job_context(os.path.basename(filepath)):
+        return _process_document(
+            filepath,
+            output_folder,
+            progress_callback,
+            checkpoint,
+            similarity_index,
+            profiler,
+        )
+
+
+def _process_document(
+    filepath, output_folder, progress_callback, checkpoint, similarity_index, profiler
+):
+    filename = os.path.basename(filepath)
+    file_size = os.path.getsize(filepath)
+
+    def run_stage(stage, func, *args, **kwargs):
+        if profiler is None:
+            return func(*args, **kwargs)
+        return profiler.call(stage, func, *args, **kwargs)
+
+    set_log_stage("extract")
+    start_time = time.perf_counter()
+    raw_text, extraction_stats = run_stage(
+        "extract",
+        extract_document,
+        filepath,
+        checkpoint,
+        progress_callback=_stage_callback(progress_callback, "extract"),
+    )
+    extraction_time = time.perf_counter() - start_time
+
+    set_log_stage("preprocess")
+    start_time = time.perf_counter()
+    processed_text, features = run_stage(
+        "preprocess",
+        preprocess_document,
+        raw_text,
+        _stage_callback(progress_callback, "preprocess"),
+    )
+    preprocessing_time = time.perf_counter() - start_time
+
+    set_log_stage("save")
+    start_time = time.perf_counter()
+    saved = save_document(
+        run_stage,
+        filename,
+        output_folder,
+        raw_text,
+        extraction_stats["page_offsets"],
+        processed_text,
+        features,
+        similarity_index,
+    )
+    saving_time = time.perf_counter() - start_time
+
+    total_time = extraction_time + preprocessing_time + saving_time
+    logger.info(f"Processed {filepath} in {total_time:.3f} seconds")
+    return {
+        "file_size": file_size,
+        "extracted_length": len(raw_text),
+        "processed_length": len(processed_text),
+        "token_count": extraction_stats["token_count"],
+        "token_count_method": extraction_stats["token_count_method"],
+        "extraction_time": extraction_time,
+        "preprocessing_time": preprocessing_time,
+        "saving_time": saving_time,
+        "total_time": total_time,
+        "skipped_pages": extraction_stats["skipped_pages"],
+        "image_only_pages": extraction_stats["image_only_pages"],
+        "resumed_pages": extraction_stats["resumed_pages"],
+        "file_path": filepath,
+        **saved,
+    }
@@ -0,0 +1,163 @@
+# profiling.py
+"""
+On-demand profiling of individual processing jobs.
+
+A job submitted for profiling runs each of its stage calls under cProfile and
+tracemalloc, in whichever process or thread the stage runs, and the results
+are kept under PROFILE_FOLDER/<job_id>/:
+
+    <n>_<stage>_<function>.pstats   cProfile stats of one stage call
+    profile.pstats                  all stage calls combined
+    report.json                     per-stage wall time, peak traced memory,
+                                    top functions and top allocation sites
+
+The .pstats files load with pstats.Stats (or snakeviz). tracemalloc traces a
+whole process, so allocations made by other jobs running at the same time in
+the same process can show up in a stage's allocation sites.
+"""
+
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import shutil
+import threading
+import time
+import tracemalloc
+from logging_config import logger
+from config import PROFILE_FOLDER, PROFILE_TOP_ENTRIES
+
+# Profiled calls running in this process; tracing stops when the last ends
+_tracing_calls = 0
+_tracing_started = False
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    global _tracing_calls, _tracing_started
+    with _tracing_lock:
+        if _tracing_calls == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_calls += 1
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing():
+    global _tracing_calls, _tracing_started
+    with _tracing_lock:
+        _tracing_calls -= 1
+        if _tracing_calls == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Call func(*args, **kwargs) under cProfile and tracemalloc. Module-level so
+    it can be submitted to the stage process pool in place of func.
+    :return: Tuple of (func's result, profile dictionary for JobProfiler.record)
+    """
+    _start_tracing()
+    baseline = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    start_time = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        wall_time = time.perf_counter() - start_time
+        snapshot = tracemalloc.take_snapshot()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        _stop_tracing()
+
+    stats = pstats.Stats(profiler).sort_stats("cumulative")
+    top_functions = []
+    for function in stats.fcn_list[:PROFILE_TOP_ENTRIES]:
+        _, calls, total_time, cumulative_time, _ = stats.stats[function]
+        top_functions.append(
+            {
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "total_time": total_time,
+                "cumulative_time": cumulative_time,
+            }
+        )
+    allocations = [
+        {
+            "site": str(difference.traceback[0]),
+            "size_diff": difference.size_diff,
+            "count_diff": difference.count_diff,
+            "size": difference.size,
+        }
+        for difference in snapshot.compare_to(baseline, "lineno")[:PROFILE_TOP_ENTRIES]
+    ]
+    return result, {
+        "function": func.__name__,
+        "wall_time": wall_time,
+        "peak_traced_bytes": peak_bytes,
+        "top_functions": top_functions,
+        "allocations": allocations,
+        # Same format pstats.Stats.dump_stats writes
+        "pstats": marshal.dumps(stats.stats),
+    }
+
+
+class JobProfiler:
+    """Collects the stage profiles of one job and writes them to its folder."""
+
+    def __init__(self, job_id, folder=PROFILE_FOLDER):
+        self.job_id = job_id
+        self.path = os.path.join(folder, job_id)
+        self.stages = []
+
+    def record(self, stage, profile):
+        """Add the profile returned by run_profiled() for a stage call."""
+        self.stages.append(dict(profile, stage=stage))
+
+    def call(self, stage, func, *args, **kwargs):
+        """Run a stage function in this thread under the profiler."""
+        result, profile = run_profiled(func, *args, **kwargs)
+        self.record(stage, profile)
+        return result
+
+    def save(self):
+        """Write the collected profiles, replacing any earlier ones of the job."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path)
+        stage_reports = []
+        pstats_paths = []
+        for index, stage in enumerate(self.stages, 1):
+            name = f"{index}_{stage['stage']}_{stage['function']}.pstats"
+            pstats_paths.append(os.path.join(self.path, name))
+            with open(pstats_paths[-1], "wb") as f:
+                f.write(stage["pstats"])
+            report = {key: value for key, value in stage.items() if key != "pstats"}
+            stage_reports.append(dict(report, pstats_file=name))
+        if pstats_paths:
+            pstats.Stats(*pstats_paths).dump_stats(
+                os.path.join(self.path, "profile.pstats")
+            )
+        with open(os.path.join(self.path, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "job_id": self.job_id,
+                    "created_at": time.time(),
+                    "combined_pstats_file": "profile.pstats" if pstats_paths else None,
+                    "stages": stage_reports,
+                },
+                f,
+                indent=2,
+            )
+        logger.info(f"Saved profile of {len(self.stages)} stage calls to {self.path}")
+
+
+def load_profile_report(job_id, folder=PROFILE_FOLDER):
+    """Return the saved profile report of a job, or None."""
+    try:
+        with open(os.path.join(folder, job_id, "report.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,175 @@
+# progress_model.py
+import json
+import os
+import threading
+import time
+from logging_config import logger
+from config import THROUGHPUT_SMOOTHING, THROUGHPUT_MODEL_PATH
+from fileutils import atomic_write
+
+# Starting rates used until completed jobs have been observed
+DEFAULT_RATES = {
+    # estimate_job_cost units (pages + content KB / 8) extracted per second
+    "extract_units_per_second": 100.0,
+    # extracted characters per cost unit, to size preprocessing before it starts
+    "chars_per_unit": 2000.0,
+    "preprocess_chars_per_second": 1_000_000.0,
+    "save_chars_per_second": 50_000_000.0,
+}
+
+STAGES = ("extract", "preprocess", "save")
+
+# Observed progress below this fraction is too noisy to extrapolate from
+MIN_EXTRAPOLATION_FRACTION = 0.05
+
+
+class ThroughputModel:
+    """
+    Rolling per-stage throughput learned from completed jobs, used to turn a
+    job's pre-scanned size into expected stage durations.
+    """
+
+    def __init__(self, smoothing=THROUGHPUT_SMOOTHING, path=THROUGHPUT_MODEL_PATH):
+        self.smoothing = smoothing
+        self.path = path
+        self.rates = dict(DEFAULT_RATES)
+        self.jobs_observed = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                self.rates.update(saved["rates"])
+                self.jobs_observed = saved["jobs_observed"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable throughput model {path}: {e}")
+
+    def estimate_seconds(self, cost, extracted_chars=None):
+        """
+        Estimate the duration of each stage for a job.
+        :param cost: estimate_job_cost() of the document
+        :param extracted_chars: Extracted text length, once known
+        :return: Dictionary of stage -> expected seconds
+        """
+        with self._lock:
+            rates = dict(self.rates)
+        if extracted_chars is None:
+            extracted_chars = cost * rates["chars_per_unit"]
+        return {
+            "extract": cost / rates["extract_units_per_second"],
+            "preprocess": extracted_chars / rates["preprocess_chars_per_second"],
+            "save": extracted_chars / rates["save_chars_per_second"],
+        }
+
+    def record(self, cost, extracted_chars, stage_seconds):
+        """
+        Fold a completed job into the rolling rates.
+        :param cost: estimate_job_cost() of the document
+        :param extracted_chars: Length of the extracted text
+        :param stage_seconds: Dictionary of stage -> measured seconds; leave
+            out stages that did not run from scratch, e.g. resumed from a
+            checkpoint
+        """
+        observed = {}
+        if cost > 0 and stage_seconds.get("extract", 0) > 0:
+            observed["extract_units_per_second"] = cost / stage_seconds["extract"]
+            observed["chars_per_unit"] = extracted_chars / cost
+        if extracted_chars > 0:
+            for stage in ("preprocess", "save"):
+                if stage_seconds.get(stage, 0) > 0:
+                    observed[f"{stage}_chars_per_second"] = (
+                        extracted_chars / stage_seconds[stage]
+                    )
+        if not observed:
+            return
+
+        with self._lock:
+            # The first job replaces the defaults outright
+            weight = self.smoothing if self.jobs_observed else 1.0
+            for key, value in observed.items():
+                self.rates[key] += weight * (value - self.rates[key])
+            self.jobs_observed += 1
+            snapshot = {"rates": dict(self.rates), "jobs_observed": self.jobs_observed}
+        if self.path:
+            try:
+                with atomic_write(self.path) as f:
+                    json.dump(snapshot, f)
+            except OSError as e:
+                logger.warning(f"Could not save throughput model: {e}")
+
+
+class JobProgress:
+    """
+    Tracks one job's progress as a share of its expected total duration.
+    Extraction progress is weighted by each page's pre-scanned content size,
+    and the current stage's remaining time is extrapolated from its observed
+    speed once enough of it is done.
+    """
+
+    def __init__(self, model, cost, page_content_bytes=None):
+        self.model = model
+        self.cost = cost
+        self.estimates = model.estimate_seconds(cost)
+        self.page_fractions = None
+        if page_content_bytes:
+            # Same weighting as estimate_job_cost: one unit per page plus content
+            weights = [1 + size / 8192 for size in page_content_bytes]
+            total = sum(weights)
+            running = 0.0
+            self.page_fractions = []
+            for weight in weights:
+                running += weight
+                self.page_fractions.append(running / total)
+        self.completed = {}
+        self.stage = None
+        self.stage_started = None
+        self.percent = 0.0
+
+    def start_stage(self, stage, extracted_chars=None):
+        """Mark the start of a stage; pass the text length when it becomes known."""
+        now = time.monotonic()
+        if self.stage is not None:
+            self.completed[self.stage] = now - self.stage_started
+        if extracted_chars is not None:
+            refined = self.model.estimate_seconds(self.cost, extracted_chars)
+            self.estimates["preprocess"] = refined["preprocess"]
+            self.estimates["save"] = refined["save"]
+        self.stage = stage
+        self.stage_started = now
+
+    def finish(self):
+        """Mark the current stage complete and return measured stage seconds."""
+        self.start_stage(None)
+        return dict(self.completed)
+
+    def update(self, stage_progress):
+        """
+        Report progress within the current stage.
+        :param stage_progress: Percentage of the current stage completed
+        :return: Tuple of (overall percentage, ETA in seconds)
+        """
+        fraction = min(max(stage_progress / 100, 0.0), 1.0)
+        if self.stage == "extract" and self.page_fractions:
+            page_index = round(fraction * len(self.page_fractions)) - 1
+            fraction = self.page_fractions[page_index] if page_index >= 0 else 0.0
+
+        elapsed = time.monotonic() - self.stage_started
+        if fraction >= MIN_EXTRAPOLATION_FRACTION:
+            stage_remaining = elapsed * (1 - fraction) / fraction
+        else:
+            stage_remaining = max(self.estimates[self.stage] - elapsed, 0.0)
+        later_stages = STAGES[STAGES.index(self.stage) + 1 :]
+        remaining = stage_remaining + sum(self.estimates[s] for s in later_stages)
+
+        done = sum(self.completed.values()) + elapsed
+        if done + remaining > 0:
+            # Never move the bar backwards when an estimate is revised
+            self.percent = max(self.percent, 100 * done / (done + remaining))
+        return self.percent, remaining
+
+
+def poll_interval(eta_seconds):
+    """Suggest how long a client should wait before polling status again."""
+    if eta_seconds is None:
+        return 1.0
+    return min(max(eta_seconds / 10, 0.5), 10.0)
@@ -0,0 +1,183 @@
+# scheduler.py
+import threading
+import time
+from logging_config import logger
+from config import (
+    SCHEDULER_POLICY,
+    SCHEDULER_WORKERS,
+    SCHEDULER_AGING,
+    SCHEDULER_MAX_WAIT,
+)
+
+POLICIES = ("fifo", "sjf", "fair")
+
+# Size classes used by the "fair" policy: (name, upper cost bound, weight).
+# Higher weight means a larger share of worker time while the class has work.
+SIZE_CLASSES = (
+    ("small", 50, 4),
+    ("medium", 1000, 2),
+    ("large", float("inf"), 1),
+)
+
+
+def size_class(cost):
+    """Return the (name, weight) of the size class a job cost falls into."""
+    for name, upper_bound, weight in SIZE_CLASSES:
+        if cost < upper_bound:
+            return name, weight
+
+
+class Job:
+    """A queued unit of work with its estimated cost."""
+
+    def __init__(self, job_id, cost, func, args):
+        self.job_id = job_id
+        self.cost = cost
+        self.func = func
+        self.args = args
+        self.size_class, self.weight = size_class(cost)
+        self.submitted = time.monotonic()
+
+
+class JobScheduler:
+    """
+    Runs submitted jobs on a fixed pool of worker threads. Instead of starting
+    jobs in arrival order, the next job is chosen by policy:
+
+    - fifo: arrival order
+    - sjf: lowest estimated cost first, with each waiting job's effective cost
+      reduced by `aging` units per second so large jobs are not starved
+    - fair: weighted-fair sharing between small, medium and large jobs
+
+    Under every policy, a job that has waited longer than `max_wait` seconds
+    runs next.
+    """
+
+    def __init__(
+        self,
+        workers=SCHEDULER_WORKERS,
+        policy=SCHEDULER_POLICY,
+        aging=SCHEDULER_AGING,
+        max_wait=SCHEDULER_MAX_WAIT,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.workers = workers
+        self.policy = policy
+        self.aging = aging
+        self.max_wait = max_wait
+        self._pending = []
+        self._condition = threading.Condition()
+        # Cost served per size class divided by its weight: the "virtual time"
+        # of weighted-fair queuing, the class furthest behind goes next
+        self._virtual_time = {name: 0.0 for name, _, _ in SIZE_CLASSES}
+        self._threads = []
+        self._running = 0
+        self._stopping = False
+
+    def _start_workers(self):
+        # Started on first submit rather than at import, so a server that forks
+        # after importing the app gets the threads in each worker process
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"scheduler-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(
+            f"Job scheduler started: {self.workers} workers, policy '{self.policy}'"
+        )
+
+    def submit(self, job_id, cost, func, *args):
+        """Queue func(*args) as job_id with the given estimated cost."""
+        job = Job(job_id, cost, func, args)
+        with self._condition:
+            if not self._threads:
+                self._start_workers()
+            if self.policy == "fair" and not any(
+                pending.size_class == job.size_class for pending in self._pending
+            ):
+                # A class becoming active starts at the current virtual time
+                # instead of using credit saved up while it was idle
+                active = [self._virtual_time[p.size_class] for p in self._pending]
+                self._virtual_time[job.size_class] = max(
+                    self._virtual_time[job.size_class], min(active, default=0.0)
+                )
+            self._pending.append(job)
+            self._condition.notify()
+        logger.info(
+            f"Queued job {job_id} with estimated cost {cost:.1f} ({job.size_class})"
+        )
+
+    def _priority(self, job, now):
+        """Sort key for pending jobs under the current policy; lower runs first."""
+        waited = now - job.submitted
+        if waited >= self.max_wait:
+            return (0, job.submitted)
+        if self.policy == "sjf":
+            return (1, job.cost - self.aging * waited)
+        if self.policy == "fair":
+            return (1, self._virtual_time[job.size_class], job.submitted)
+        return (1, job.submitted)
+
+    def _next_job(self):
+        """Remove and return the next job to run. Called with the lock held."""
+        now = time.monotonic()
+        job = min(self._pending, key=lambda pending: self._priority(pending, now))
+        self._pending.remove(job)
+        self._virtual_time[job.size_class] += job.cost / job.weight
+        return job
+
+    def queue_position(self, job_id):
+        """Return the 1-based position of a pending job, or None if not queued."""
+        with self._condition:
+            now = time.monotonic()
+            ordered = sorted(
+                self._pending, key=lambda pending: self._priority(pending, now)
+            )
+        for position, job in enumerate(ordered, 1):
+            if job.job_id == job_id:
+                return position
+        return None
+
+    def drain(self, timeout):
+        """
+        Stop starting queued jobs and wait up to timeout seconds for the
+        running ones to finish.
+        :return: Number of jobs still running when the wait ended
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            running = self._running
+        logger.info(
+            f"Job scheduler drained: {running} jobs still running, "
+            f"{len(self._pending)} left queued"
+        )
+        return running
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                job = self._next_job()
+                self._running += 1
+            waited = time.monotonic() - job.submitted
+            logger.info(f"Starting job {job.job_id} after waiting {waited:.1f}s")
+            try:
+                job.func(*job.args)
+            except Exception as e:
+                logger.error(f"Unhandled error in job {job.job_id}: {str(e)}")
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._condition.notify_all()
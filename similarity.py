@@ -0,0 +1,241 @@
+# similarity.py
+"""
+Near-duplicate detection across processed documents.
+
+Each document's preprocessed tokens are cut into overlapping shingles of
+MINHASH_SHINGLE_SIZE tokens, and a MinHash signature of MINHASH_PERMUTATIONS
+values is computed over them with NumPy. The fraction of equal values in two
+signatures estimates the Jaccard similarity of the documents' shingle sets.
+
+Signatures are kept in a SQLite index together with locality-sensitive
+hashing buckets: the signature is split into LSH_BANDS bands and each band is
+hashed to a bucket, so candidate near-duplicates are the documents sharing at
+least one bucket, found without comparing against every indexed document.
+"""
+
+import hashlib
+import time
+import zlib
+from logging_config import logger
+from sqlite_db import enable_wal, immediate_transaction
+from config import (
+    SIMILARITY_INDEX_PATH,
+    MINHASH_PERMUTATIONS,
+    MINHASH_SHINGLE_SIZE,
+    LSH_BANDS,
+    NEAR_DUPLICATE_THRESHOLD,
+)
+
+# NumPy is imported where it is used, so importing this module stays cheap
+_SHINGLE_MULTIPLIER = 0x100000001B3
+# Shingles hashed through the permutations at a time, bounding memory use
+_BLOCK_SIZE = 4096
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS minhash_signatures ("
+    "job_id TEXT PRIMARY KEY, signature BLOB NOT NULL, "
+    "token_count INTEGER NOT NULL, indexed_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+    "bucket BLOB NOT NULL, job_id TEXT NOT NULL, PRIMARY KEY (bucket, job_id))",
+    "CREATE INDEX IF NOT EXISTS lsh_buckets_job_id ON lsh_buckets (job_id)",
+)
+
+
+def _permutations(num_perm):
+    import numpy as np
+
+    # Fixed seed: signatures stored in the index must stay comparable
+    rng = np.random.default_rng(1)
+    # Multiply-shift hashing of 32-bit values: (a * x + b) >> 32 with a odd,
+    # computed in wrapping uint64 arithmetic
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a + np.uint64(1), b
+
+
+def shingle_hashes(tokens, shingle_size=MINHASH_SHINGLE_SIZE):
+    """
+    Return the 32-bit hashes of the shingles (runs of shingle_size
+    consecutive tokens) of a token list, as a NumPy array. Repeated shingles
+    are not removed; they do not change a minimum.
+    """
+    import numpy as np
+
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    # Each distinct token is hashed once; CRC32 is stable across processes
+    token_ids = {token: zlib.crc32(token.encode("utf-8")) for token in set(tokens)}
+    token_hashes = np.fromiter(
+        map(token_ids.__getitem__, tokens), dtype=np.uint64, count=len(tokens)
+    )
+    size = min(shingle_size, len(tokens))
+    count = len(tokens) - size + 1
+    # Polynomial hash of each window, with uint64 arithmetic wrapping around
+    multiplier = np.uint64(_SHINGLE_MULTIPLIER)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * multiplier + token_hashes[offset : offset + count]
+    return (hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+
+
+def minhash_signature(tokens, num_perm=MINHASH_PERMUTATIONS):
+    """
+    Compute the MinHash signature of a token list.
+    :return: uint64 NumPy array of num_perm values, or None if there are no
+        tokens (every empty document would otherwise get the same signature)
+    """
+    import numpy as np
+
+    hashes = shingle_hashes(tokens)
+    if not len(hashes):
+        return None
+    a, b = _permutations(num_perm)
+    signature = np.full(num_perm, 1 << 32, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK_SIZE):
+        block = hashes[start : start + _BLOCK_SIZE, np.newaxis]
+        permuted = (block * a + b) >> np.uint64(32)
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+
+def _band_buckets(signature, bands):
+    rows = len(signature) // bands
+    return [
+        band.to_bytes(2, "big")
+        + hashlib.blake2b(
+            signature[band * rows : (band + 1) * rows].tobytes(), digest_size=8
+        ).digest()
+        for band in range(bands)
+    ]
+
+
+class SimilarityIndex:
+    """
+    Persistent MinHash/LSH index of processed documents in a SQLite database,
+    shareable by several server and worker processes on one host.
+    """
+
+    def __init__(
+        self,
+        path=SIMILARITY_INDEX_PATH,
+        num_perm=MINHASH_PERMUTATIONS,
+        bands=LSH_BANDS,
+        threshold=NEAR_DUPLICATE_THRESHOLD,
+        min_tokens=MINHASH_SHINGLE_SIZE,
+    ):
+        if num_perm % bands:
+            raise ValueError(
+                f"MINHASH_PERMUTATIONS ({num_perm}) must be a multiple of "
+                f"LSH_BANDS ({bands})"
+            )
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        # Shorter documents have too few shingles for a meaningful estimate
+        self.min_tokens = min_tokens
+        enable_wal(path)
+        with self._transaction() as cursor:
+            for statement in _SCHEMA:
+                cursor.execute(statement)
+
+    def _transaction(self):
+        return immediate_transaction(self.path)
+
+    def _query(self, cursor, signature, exclude, threshold):
+        import numpy as np
+
+        buckets = _band_buckets(signature, self.bands)
+        cursor.execute(
+            "SELECT DISTINCT s.job_id, s.signature FROM lsh_buckets b "
+            "JOIN minhash_signatures s ON s.job_id = b.job_id "
+            f"WHERE b.bucket IN ({', '.join('?' * len(buckets))}) "
+            "AND s.token_count >= ?",
+            buckets + [self.min_tokens],
+        )
+        candidates = [
+            (job_id, np.frombuffer(stored, dtype=np.uint64))
+            for job_id, stored in cursor.fetchall()
+            if job_id != exclude
+        ]
+        # Signatures made with other settings are not comparable
+        candidates = [
+            (job_id, s) for job_id, s in candidates if len(s) == len(signature)
+        ]
+        if not candidates:
+            return []
+        similarities = (np.stack([s for _, s in candidates]) == signature).mean(axis=1)
+        matches = [
+            {"job_id": job_id, "similarity": round(float(similarity), 3)}
+            for (job_id, _), similarity in zip(candidates, similarities)
+            if similarity >= threshold
+        ]
+        return sorted(matches, key=lambda match: match["similarity"], reverse=True)
+
+    def add_document(self, job_id, text):
+        """
+        Index a document's preprocessed text, replacing any earlier entry for
+        job_id, and return the already indexed documents it nearly duplicates.
+        :param text: Preprocessed text, tokens separated by whitespace
+        :return: List of {"job_id", "similarity"} dictionaries, most similar first
+        """
+        tokens = text.split()
+        return self.add_signature(
+            job_id, minhash_signature(tokens, self.num_perm), len(tokens)
+        )
+
+    def add_signature(self, job_id, signature, token_count):
+        """
+        Like add_document(), for a signature already computed with
+        minhash_signature(), e.g. in another process.
+        :param signature: MinHash signature of num_perm values, or None
+        :param token_count: Number of tokens the signature was computed from
+        """
+        if signature is None or token_count < self.min_tokens:
+            logger.info(f"{job_id} is too short to index for near-duplicates")
+            return []
+        with self._transaction() as cursor:
+            matches = self._query(cursor, signature, job_id, self.threshold)
+            cursor.execute("DELETE FROM lsh_buckets WHERE job_id = ?", (job_id,))
+            cursor.execute(
+                "INSERT OR REPLACE INTO minhash_signatures "
+                "(job_id, signature, token_count, indexed_at) VALUES (?, ?, ?, ?)",
+                (job_id, signature.tobytes(), token_count, time.time()),
+            )
+            cursor.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (bucket, job_id) VALUES (?, ?)",
+                [(bucket, job_id) for bucket in _band_buckets(signature, self.bands)],
+            )
+        if matches:
+            logger.warning(
+                f"{job_id} is a near-duplicate of "
+                + ", ".join(f"{m['job_id']} ({m['similarity']:.0%})" for m in matches)
+            )
+        return matches
+
+    def similar(self, job_id, threshold=None):
+        """
+        Return the indexed documents similar to an indexed job, or None if
+        job_id has not been indexed. Documents shorter than min_tokens have no
+        similar documents.
+        """
+        import numpy as np
+
+        with self._transaction() as cursor:
+            cursor.execute(
+                "SELECT signature, token_count FROM minhash_signatures "
+                "WHERE job_id = ?",
+                (job_id,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            if row[1] < self.min_tokens:
+                return []
+            signature = np.frombuffer(row[0], dtype=np.uint64)
+            return self._query(
+                cursor,
+                signature,
+                job_id,
+                self.threshold if threshold is None else threshold,
+            )
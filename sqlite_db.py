@@ -0,0 +1,44 @@
+# sqlite_db.py
+"""
+SQLite helpers for databases shared by several server and worker processes on
+one host (the job queue and the similarity index).
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+def enable_wal(path):
+    """
+    Create the database's folder if needed and switch it to write-ahead
+    logging, which lets readers proceed while another process holds the write
+    lock. The mode is stored in the database file, so this is done once.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+    finally:
+        connection.close()
+
+
+@contextmanager
+def immediate_transaction(path):
+    """
+    Yield a cursor inside a transaction that takes the database write lock up
+    front (BEGIN IMMEDIATE), committed when the block completes and rolled
+    back if it raises.
+    """
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+    finally:
+        connection.close()
@@ -0,0 +1,176 @@
+# stage_executors.py
+"""
+Per-stage executors for web processing jobs.
+
+CPU-bound stages (extraction, preprocessing, chunking, MinHash signatures)
+run in a process pool, so jobs parse in parallel instead of contending for
+the GIL, and file I/O runs in a small thread pool. Each kind of stage admits
+at most workers + queue_size jobs at a time; a job submitting to a full stage
+blocks until a slot frees up. With several scheduler workers this overlaps
+jobs (one job's output is written while the next job's pages are parsed) and
+backs excess work up into the job scheduler, where it is still ordered by
+policy, rather than into memory between stages.
+
+Progress callbacks and log records from the worker processes are relayed to
+the parent over a queue, so status updates and /latest_logs behave as if the
+stage had run in the job thread.
+"""
+
+import contextvars
+import itertools
+import logging.handlers
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging_config import logger, job_context, current_job_id
+from config import PIPELINE_CPU_WORKERS, PIPELINE_IO_WORKERS, PIPELINE_QUEUE_SIZE
+
+# Which executor each pipeline stage runs on
+STAGE_KINDS = {
+    "extract": "cpu",
+    "preprocess": "cpu",
+    "chunk": "cpu",
+    "minhash": "cpu",
+    "save": "io",
+}
+
+# Relay queue to the parent, set in each worker process by _init_worker
+_events = None
+
+
+def process_context():
+    """Return the multiprocessing context used to start pipeline subprocesses."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Forking avoids re-importing the app (and re-running logging setup)
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+    # Records go to the parent's handlers instead of being written twice
+    logger.handlers = [logging.handlers.QueueHandler(events)]
+
+
+def _run_in_worker(token, job_id, stage, func, args):
+    def progress_callback(progress):
+        _events.put(("progress", token, progress))
+
+    with job_context(job_id, stage):
+        return func(*args, progress_callback=progress_callback)
+
+
+class StageExecutors:
+    """Process pool for CPU-bound stages and thread pool for I/O stages."""
+
+    def __init__(
+        self,
+        cpu_workers=PIPELINE_CPU_WORKERS,
+        io_workers=PIPELINE_IO_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+    ):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self._slots = {
+            "cpu": threading.BoundedSemaphore(max(cpu_workers, 1) + queue_size),
+            "io": threading.BoundedSemaphore(io_workers + queue_size),
+        }
+        self._io_pool = None
+        self._cpu_pool = None
+        self._context = None
+        self._events = None
+        self._pool_lock = threading.Lock()
+        # token -> progress callback of a running CPU stage
+        self._callbacks = {}
+        self._callbacks_lock = threading.Lock()
+        self._tokens = itertools.count()
+
+    def _start(self):
+        # Started on first use rather than at import, so a server that forks
+        # after importing the app gets its own pools in each worker process
+        with self._pool_lock:
+            if self._io_pool is not None:
+                return
+            self._io_pool = ThreadPoolExecutor(self.io_workers, "stage-io")
+            if self.cpu_workers > 0:
+                self._context = process_context()
+                self._events = self._context.Queue()
+                threading.Thread(
+                    target=self._relay, name="stage-relay", daemon=True
+                ).start()
+            logger.info(
+                f"Stage executors started: {self.cpu_workers} CPU processes, "
+                f"{self.io_workers} I/O threads"
+            )
+
+    def _get_cpu_pool(self):
+        with self._pool_lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = ProcessPoolExecutor(
+                    self.cpu_workers,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(self._events,),
+                )
+            return self._cpu_pool
+
+    def _discard_cpu_pool(self, pool):
+        with self._pool_lock:
+            if self._cpu_pool is pool:
+                self._cpu_pool = None
+        pool.shutdown(wait=False)
+
+    def _relay(self):
+        while True:
+            event = self._events.get()
+            if isinstance(event, logging.LogRecord):
+                logger.handle(event)
+                continue
+            _, token, progress = event
+            # Held while calling back so run() can't return mid-update
+            with self._callbacks_lock:
+                callback = self._callbacks.get(token)
+                if callback is not None:
+                    callback(progress)
+
+    def run(self, stage, func, *args, progress_callback=None):
+        """
+        Run a stage function and return its result, first blocking while the
+        executor for that stage is full.
+        :param stage: Pipeline stage name, a key of STAGE_KINDS
+        :param func: Module-level function; CPU stages call it as
+            func(*args, progress_callback=...) in a worker process, I/O stages
+            as func(*args) on a thread
+        :param progress_callback: Function called with progress percentages
+        """
+        self._start()
+        kind = STAGE_KINDS[stage]
+        with self._slots[kind]:
+            if kind == "io":
+                # Copy the context so the thread logs under the same job
+                return self._io_pool.submit(
+                    contextvars.copy_context().run, func, *args
+                ).result()
+            if self.cpu_workers == 0:
+                return func(*args, progress_callback=progress_callback)
+
+            token = next(self._tokens)
+            if progress_callback is not None:
+                with self._callbacks_lock:
+                    self._callbacks[token] = progress_callback
+            pool = self._get_cpu_pool()
+            try:
+                return pool.submit(
+                    _run_in_worker, token, current_job_id(), stage, func, args
+                ).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); later jobs get a new pool
+                logger.error(f"Stage worker process died during {stage}")
+                self._discard_cpu_pool(pool)
+                raise
+            finally:
+                # Late progress events for a finished stage are dropped
+                with self._callbacks_lock:
+                    self._callbacks.pop(token, None)
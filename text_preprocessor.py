@@ -1,16 +1,32 @@
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+import base64
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
 
-
-# List of NLTK resources required by the application
-import nltk
-from logging_config import logger
+# nltk is imported inside the functions that need it: importing it (and its
+# corpus readers) takes several hundred milliseconds, which processes that
+# only serve status or downloads should not pay at startup.
+from logging_config import logger, should_log_sample
+from config import (
+    TEXT_NORMALIZATION,
+    NORMALIZATION_CACHE_SIZE,
+    BPE_RANKS_FILE,
+    TOKEN_COUNT_CACHE_SIZE,
+    FEATURE_DIMENSION,
+)
 
 
 def download_nltk_resources():
+    import nltk
+
     # List of NLTK resources required by the application
     resources = ["punkt", "stopwords", "punkt_tab"]
+    if TEXT_NORMALIZATION == "lemma":
+        resources.append("wordnet")
 
     for resource in resources:
         try:
@@ -31,6 +47,33 @@ def download_nltk_resources():
                 logger.warning("Using fallback tokenization and stopwords removal.")
 
 
+@lru_cache(maxsize=None)
+def get_stop_words(language="english"):
+    """Return the NLTK stopword set for a language, loaded once per process."""
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words(language))
+
+
+def warm_up():
+    """
+    Load NLTK resources, the punkt tokenizer and the stopword set up front.
+    Called in the server master process before forking so workers share the
+    loaded models copy-on-write instead of each loading them on first request.
+    """
+    download_nltk_resources()
+    try:
+        from nltk.tokenize import word_tokenize
+
+        word_tokenize("Warm up the tokenizer.")
+        get_stop_words()
+        if TEXT_NORMALIZATION != "none":
+            normalize_tokens(["warming"], TEXT_NORMALIZATION)
+        logger.info("NLTK models and stopwords preloaded")
+    except Exception as e:
+        logger.warning(f"Could not preload NLTK models, workers will use fallback: {e}")
+
+
 # Add fallback tokenization and stopwords
 def fallback_tokenize(text):
     logger.info("Using fallback tokenization method")
@@ -220,8 +263,200 @@ fallback_stopwords = {
 }
 
 
-def preprocess_text(text, progress_callback=None):
+# Stemmer/lemmatizer instances, created on first use and shared by all jobs
+_normalizers = {}
+_normalizers_lock = threading.Lock()
+
+
+def _get_normalizer(method):
+    with _normalizers_lock:
+        if method not in _normalizers:
+            if method == "stem":
+                from nltk.stem import PorterStemmer
+
+                _normalizers[method] = PorterStemmer().stem
+            elif method == "lemma":
+                from nltk.stem import WordNetLemmatizer
+
+                _normalizers[method] = WordNetLemmatizer().lemmatize
+            else:
+                raise ValueError(f"Unknown normalization method: {method}")
+        return _normalizers[method]
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_term(method, token):
+    return _get_normalizer(method)(token)
+
+
+def normalize_tokens(tokens, method):
+    """
+    Stem or lemmatize a list of tokens.
+    Each distinct token is normalized once through a bounded LRU memo that is
+    shared across jobs in this process, and the result is re-expanded to the
+    original token order.
+    :param tokens: List of tokens
+    :param method: "stem" or "lemma"
+    :return: List of normalized tokens
+    """
+    if method not in ("stem", "lemma"):
+        raise ValueError(f"Unknown normalization method: {method}")
+    mapping = {token: _normalize_term(method, token) for token in dict.fromkeys(tokens)}
+    logger.info(
+        f"Normalized {len(tokens)} tokens ({len(mapping)} unique) using '{method}', "
+        f"cache: {_normalize_term.cache_info()}"
+    )
+    return [mapping[token] for token in tokens]
+
+
+# cl100k_base pre-tokenization split, with \\p{L} and \\p{N} spelled for re
+_BPE_SPLIT_RE = re.compile(
+    r"'(?i:[sdmt]|ll|ve|re)"
+    r"|(?:[^\r\n\w]|_)?+[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)++[\r\n]*"
+    r"|\s*[\r\n]"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+# Pieces the approximation counts: letter runs, digit groups and punctuation
+_APPROX_PIECE_RE = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+
+# BPE merge ranks, loaded on first use; False once BPE_RANKS_FILE is found missing
+_bpe_ranks = None
+_bpe_ranks_lock = threading.Lock()
+
+# Token counts of recently counted texts, keyed by content hash
+_token_counts = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+def _get_bpe_ranks():
+    global _bpe_ranks
+    with _bpe_ranks_lock:
+        if _bpe_ranks is None:
+            if not os.path.exists(BPE_RANKS_FILE):
+                logger.info(
+                    f"No BPE ranks file at {BPE_RANKS_FILE}, approximating token counts"
+                )
+                _bpe_ranks = False
+            else:
+                ranks = {}
+                with open(BPE_RANKS_FILE, "rb") as f:
+                    for line in f:
+                        if line.strip():
+                            token, rank = line.split()
+                            ranks[base64.b64decode(token)] = int(rank)
+                logger.info(f"Loaded {len(ranks)} BPE ranks from {BPE_RANKS_FILE}")
+                _bpe_ranks = ranks
+        return _bpe_ranks
+
+
+@lru_cache(maxsize=65536)
+def _bpe_piece_tokens(piece):
+    ranks = _bpe_ranks
+    parts = [piece[i : i + 1] for i in range(len(piece))]
+    while len(parts) > 1:
+        # Merge the adjacent pair with the lowest rank, as the encoder does
+        best_rank, best_index = None, None
+        for i in range(len(parts) - 1):
+            rank = ranks.get(parts[i] + parts[i + 1])
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank, best_index = rank, i
+        if best_index is None:
+            break
+        parts[best_index : best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+    return len(parts)
+
+
+def estimate_tokens(text):
+    """
+    Approximate the model token count of text without a tokenizer: one token
+    per punctuation mark or group of up to three digits, and one per six
+    letters of a letter run, which tracks cl100k_base on English prose.
+    """
+    return sum(
+        (len(piece) + 5) // 6 if piece[0].isalpha() else 1
+        for piece in _APPROX_PIECE_RE.findall(text)
+    )
+
+
+def token_count_method():
+    """Return "exact" if BPE ranks are available, otherwise "approximate"."""
+    return "exact" if _get_bpe_ranks() else "approximate"
+
+
+def count_tokens(text, cache=True):
+    """
+    Count the model tokens of text: exactly by BPE-merging each pre-tokenized
+    piece with the ranks in BPE_RANKS_FILE when it exists, otherwise with
+    estimate_tokens(). Pieces are memoized, so common words are merged once.
+    :param cache: Remember the count by content hash, so counting the same
+        document again (a retry or a re-upload) is a dictionary lookup
+    :return: Number of tokens
+    """
+    key = None
+    if cache:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with _token_counts_lock:
+            if key in _token_counts:
+                _token_counts.move_to_end(key)
+                return _token_counts[key]
+
+    if _get_bpe_ranks():
+        count = sum(
+            _bpe_piece_tokens(piece.encode("utf-8"))
+            for piece in _BPE_SPLIT_RE.findall(text)
+        )
+    else:
+        count = estimate_tokens(text)
+
+    if cache:
+        with _token_counts_lock:
+            _token_counts[key] = count
+            while len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+                _token_counts.popitem(last=False)
+    return count
+
+
+def hashed_term_frequencies(tokens, dimension=FEATURE_DIMENSION, batch_size=10000):
+    """
+    Count tokens into a fixed number of hash buckets (feature hashing).
+    Each distinct token is hashed once with CRC32, which is stable across
+    processes, and bucket ids are counted a batch at a time with NumPy.
+    :param tokens: List of tokens
+    :param dimension: Number of buckets
+    :return: Dictionary with the dimension and the sparse vector as sorted
+        "indices" and their "values" (term counts), both uint32 arrays
+    """
+    import numpy as np  # only needed when feature vectors are enabled
+
+    buckets = {}
+    counts = np.zeros(dimension, dtype=np.uint32)
+    for i in range(0, len(tokens), batch_size):
+        batch = tokens[i : i + batch_size]
+        for token in set(batch).difference(buckets):
+            buckets[token] = zlib.crc32(token.encode("utf-8")) % dimension
+        ids = np.fromiter(map(buckets.__getitem__, batch), np.intp, len(batch))
+        counts += np.bincount(ids, minlength=dimension).astype(np.uint32)
+    indices = np.flatnonzero(counts).astype(np.uint32)
+    logger.info(
+        f"Hashed {len(tokens)} tokens ({len(buckets)} unique) into "
+        f"{len(indices)} of {dimension} feature buckets"
+    )
+    return {"dimension": dimension, "indices": indices, "values": counts[indices]}
+
+
+def preprocess_text(text, progress_callback=None, normalization=None, features=None):
+    """
+    Tokenize text, remove stopwords and optionally stem or lemmatize.
+    :param features: Optional dictionary filled with the hashed term
+        frequencies of the resulting tokens (see hashed_term_frequencies)
+    :return: Preprocessed text, tokens separated by spaces
+    """
     try:
+        from nltk.tokenize import word_tokenize
+
         logger.info("Starting text preprocessing")
 
         # Tokenize the text
@@ -231,7 +466,7 @@ def preprocess_text(text, progress_callback=None):
 
         # Remove stopwords in batches
         logger.info("Removing stopwords")
-        stop_words = set(stopwords.words("english"))
+        stop_words = get_stop_words()
         filtered_tokens = []
         batch_size = 10000  # Adjust this based on memory constraints
         total_batches = (len(tokens) + batch_size - 1) // batch_size
@@ -245,26 +480,42 @@ def preprocess_text(text, progress_callback=None):
                 progress = ((i + batch_size) / len(tokens)) * 100
                 progress_callback(min(progress, 100))
 
-            logger.info(f"Processed batch {(i // batch_size) + 1}/{total_batches}")
+            batch_number = (i // batch_size) + 1
+            if should_log_sample(batch_number, total_batches):
+                logger.info(f"Processed batch {batch_number}/{total_batches}")
 
         logger.info(
             f"Stopwords removed: {len(tokens) - len(filtered_tokens)} stopwords"
         )
+    except Exception as e:
+        filtered_tokens = _fallback_preprocess_tokens(e, text)
 
-        # Join the tokens back into a string
-        logger.info("Joining tokens back into a string")
-        preprocessed_text = " ".join(filtered_tokens)
+    # Optional stemming/lemmatization, applied whichever tokenizer ran so the
+    # output does not depend on which NLTK resources are installed
+    normalization = normalization or TEXT_NORMALIZATION
+    if normalization != "none":
+        try:
+            filtered_tokens = normalize_tokens(filtered_tokens, normalization)
+        except LookupError as e:
+            # The lemmatizer needs the wordnet corpus; the stemmer needs none
+            logger.error(f"Could not {normalization} tokens, stemming instead: {e}")
+            filtered_tokens = normalize_tokens(filtered_tokens, "stem")
 
-        logger.info(
-            f"Preprocessing complete: {len(preprocessed_text)} characters in preprocessed text"
-        )
-        return preprocessed_text
-    except Exception as e:
-        return _extracted_from_preprocess_text_41(e, text)
+    if features is not None:
+        features.update(hashed_term_frequencies(filtered_tokens))
+
+    # Join the tokens back into a string
+    logger.info("Joining tokens back into a string")
+    preprocessed_text = " ".join(filtered_tokens)
+
+    logger.info(
+        f"Preprocessing complete: {len(preprocessed_text)} characters in preprocessed text"
+    )
+    return preprocessed_text
 
 
-# TODO Rename this here and in `preprocess_text`
-def _extracted_from_preprocess_text_41(e, text):
+def _fallback_preprocess_tokens(e, text):
+    """Tokenize and remove stopwords without NLTK after the NLTK path failed."""
     logger.error(f"Error during text preprocessing: {e}")
     logger.warning("Using fallback preprocessing method.")
 
@@ -286,4 +537,4 @@ def _extracted_from_preprocess_text_41(e, text):
     logger.info(
         f"Fallback stopwords removed: {len(tokens) - len(filtered_tokens)} stopwords"
     )
-    return " ".join(filtered_tokens)
+    return filtered_tokens
@@ -0,0 +1,264 @@
+# watch_folder.py
+"""
+Watch-folder ingestion daemon: PDFs dropped into WATCH_FOLDER are
+processed without going through the HTTP upload path.
+
+Files are picked up via inotify on Linux (falling back to polling elsewhere or
+on filesystems without inotify support), processed once they have stopped
+changing for WATCH_SETTLE_SECONDS, and then moved to the done/ or failed/
+subfolder of the watched folder.
+
+Usage:
+    python watch_folder.py [--folder DIR] [--workers N]
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import shutil
+import signal
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import (
+    WATCH_FOLDER,
+    PROCESSED_FILE_FOLDER,
+    WATCH_POLL_INTERVAL,
+    WATCH_SETTLE_SECONDS,
+    WATCH_MAX_WORKERS,
+)
+from logging_config import logger
+from pipeline import process_document
+from text_preprocessor import download_nltk_resources
+
+DONE_SUBFOLDER = "done"
+FAILED_SUBFOLDER = "failed"
+
+
+class InotifyWatcher:
+    """Minimal ctypes inotify binding reporting files closed or moved into a folder."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+        :return: List of file names, or None if the kernel queue overflowed
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+            offset += self._EVENT_HEADER.size
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            names.append(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _list_pdfs(folder):
+    with os.scandir(folder) as entries:
+        return [
+            entry.name
+            for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(".pdf")
+        ]
+
+
+def _ignore_signals():
+    # Ctrl-C/SIGTERM go to the whole process group; let the parent decide
+    # when to stop so in-flight files finish instead of being interrupted
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _move_to(folder, subfolder, name):
+    target_folder = os.path.join(folder, subfolder)
+    os.makedirs(target_folder, exist_ok=True)
+    try:
+        shutil.move(os.path.join(folder, name), os.path.join(target_folder, name))
+    except FileNotFoundError:
+        logger.warning(f"Watched file {name} was removed before it could be moved")
+
+
+class FolderWatcher:
+    """Debounce new PDFs in a folder and feed them to a bounded process pool."""
+
+    def __init__(
+        self,
+        folder=WATCH_FOLDER,
+        output_folder=PROCESSED_FILE_FOLDER,
+        max_workers=WATCH_MAX_WORKERS,
+        settle_seconds=WATCH_SETTLE_SECONDS,
+        poll_interval=WATCH_POLL_INTERVAL,
+    ):
+        self.folder = folder
+        self.output_folder = output_folder
+        self.max_workers = max_workers
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # name -> (size, mtime, time the file was last seen changing)
+        self.candidates = {}
+        # Future -> file name, at most max_workers entries
+        self.in_flight = {}
+        self.executor = None
+        self.running = False
+
+    def _track(self, names):
+        for name in names:
+            if name.lower().endswith(".pdf") and name not in self.candidates:
+                self.candidates[name] = (None, None, time.monotonic())
+
+    def _settled_files(self):
+        """Return candidates whose size and mtime have not changed recently."""
+        now = time.monotonic()
+        in_flight_names = set(self.in_flight.values())
+        settled = []
+        for name, (size, mtime, changed_at) in list(self.candidates.items()):
+            if name in in_flight_names:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                del self.candidates[name]
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                self.candidates[name] = (stat.st_size, stat.st_mtime, now)
+            elif now - changed_at >= self.settle_seconds and stat.st_size > 0:
+                settled.append(name)
+        return settled
+
+    def _start_executor(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_ignore_signals
+        )
+
+    def _restart_executor(self):
+        logger.error("A worker process died; restarting the process pool")
+        self.executor.shutdown(wait=False)
+        self._start_executor()
+
+    def _reap(self):
+        broken = False
+        for future in [f for f in self.in_flight if f.done()]:
+            name = self.in_flight.pop(future)
+            self.candidates.pop(name, None)
+            try:
+                result = future.result()
+                logger.info(
+                    f"Watched file processed: {name} -> {result['processed_file_path']}"
+                )
+                _move_to(self.folder, DONE_SUBFOLDER, name)
+            except Exception as e:
+                broken |= isinstance(e, BrokenProcessPool)
+                logger.error(f"Error processing watched file {name}: {str(e)}")
+                _move_to(self.folder, FAILED_SUBFOLDER, name)
+        if broken and self.running:
+            self._restart_executor()
+
+    def _dispatch(self):
+        for name in self._settled_files():
+            if len(self.in_flight) >= self.max_workers:
+                break
+            filepath = os.path.join(self.folder, name)
+            logger.info(f"Queueing watched file: {filepath}")
+            try:
+                future = self.executor.submit(
+                    process_document, filepath, self.output_folder
+                )
+            except BrokenProcessPool:
+                # The file stays a candidate and is queued on the new pool
+                self._restart_executor()
+                return
+            self.in_flight[future] = name
+
+    def stop(self, *_):
+        logger.info("Stopping folder watcher")
+        self.running = False
+
+    def run(self):
+        """Watch the folder until stop() is called or SIGTERM/SIGINT is received."""
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            inotify = InotifyWatcher(self.folder)
+            logger.info(f"Watching {self.folder} with inotify")
+        except (OSError, AttributeError) as e:
+            inotify = None
+            logger.warning(
+                f"inotify unavailable ({e}), polling {self.folder} "
+                f"every {self.poll_interval}s"
+            )
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.running = True
+        self._track(_list_pdfs(self.folder))
+
+        self._start_executor()
+        try:
+            while self.running:
+                if inotify is None:
+                    time.sleep(self.poll_interval)
+                    self._track(_list_pdfs(self.folder))
+                else:
+                    names = inotify.read_events(self.poll_interval)
+                    self._track(_list_pdfs(self.folder) if names is None else names)
+                self._reap()
+                self._dispatch()
+        finally:
+            if inotify is not None:
+                inotify.close()
+            logger.info(f"Waiting for {len(self.in_flight)} in-flight files")
+            self.running = False
+            self.executor.shutdown(wait=True)
+            self._reap()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Process PDFs dropped into a folder without HTTP uploads."
+    )
+    parser.add_argument("--folder", default=WATCH_FOLDER)
+    parser.add_argument("--output", default=PROCESSED_FILE_FOLDER)
+    parser.add_argument("--workers", type=int, default=WATCH_MAX_WORKERS)
+    parser.add_argument("--settle-seconds", type=float, default=WATCH_SETTLE_SECONDS)
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    download_nltk_resources()
+    FolderWatcher(
+        folder=args.folder,
+        output_folder=args.output,
+        max_workers=args.workers,
+        settle_seconds=args.settle_seconds,
+        poll_interval=args.poll_interval,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
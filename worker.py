@@ -0,0 +1,221 @@
+# worker.py
+"""
+Standalone processing worker: claims jobs from the shared queue configured by
+JOB_QUEUE_URL and runs the extract -> preprocess -> save pipeline, so
+processing capacity can be added without touching the web servers. Uploaded
+files, PROCESSED_FILE_FOLDER and CHECKPOINT_FOLDER must be on storage shared
+with the web tier.
+
+While a job runs its lease is extended every JOB_HEARTBEAT_INTERVAL seconds
+along with its progress. A worker that dies stops heartbeating and the job is
+picked up by another worker once the lease expires, resuming extraction from
+its checkpoint.
+
+Usage:
+    JOB_QUEUE_URL=postgresql://host/db python worker.py [--concurrency N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from config import (
+    JOB_QUEUE_URL,
+    JOB_LEASE_SECONDS,
+    JOB_HEARTBEAT_INTERVAL,
+    WORKER_CONCURRENCY,
+    WORKER_POLL_INTERVAL,
+    PROCESSED_FILE_FOLDER,
+    CHECKPOINTS,
+    NEAR_DUPLICATE_DETECTION,
+)
+from checkpoints import JobCheckpoint
+from job_queue import open_job_queue
+from logging_config import logger
+from pdf_processor import estimate_job_cost
+from pipeline import process_document
+from profiling import JobProfiler
+from progress_model import ThroughputModel, JobProgress
+from similarity import SimilarityIndex
+from text_preprocessor import download_nltk_resources
+
+
+class QueueWorker:
+    """Claims and runs jobs one at a time until stop() is called."""
+
+    def __init__(
+        self,
+        job_queue,
+        output_folder=PROCESSED_FILE_FOLDER,
+        lease_seconds=JOB_LEASE_SECONDS,
+        heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+        poll_interval=WORKER_POLL_INTERVAL,
+    ):
+        self.job_queue = job_queue
+        self.output_folder = output_folder
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.throughput_model = ThroughputModel()
+        self.similarity_index = SimilarityIndex() if NEAR_DUPLICATE_DETECTION else None
+        self._stopping = threading.Event()
+
+    def stop(self, *_):
+        logger.info(f"Worker {self.worker_id} stopping after the current job")
+        self._stopping.set()
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} waiting for jobs")
+        while not self._stopping.is_set():
+            try:
+                job = self.job_queue.claim(self.worker_id, self.lease_seconds)
+                if job is not None:
+                    self.run_job(job)
+                    continue
+            except Exception as e:
+                # e.g. the queue database is briefly unreachable
+                logger.error(f"Worker {self.worker_id} queue error: {str(e)}")
+            self._stopping.wait(self.poll_interval)
+
+    def _heartbeat(self, job, state, done):
+        while not done.wait(self.heartbeat_interval):
+            if not self.job_queue.heartbeat(
+                job["job_id"],
+                self.worker_id,
+                self.lease_seconds,
+                state["progress"],
+                state["details"],
+            ):
+                logger.warning(
+                    f"Lost the lease on job {job['job_id']}; its result will be discarded"
+                )
+                return
+
+    def run_job(self, job):
+        job_id = job["job_id"]
+        logger.info(
+            f"Claimed job {job_id} (attempt {job['attempts']}/{job['max_attempts']})"
+        )
+        state = {"progress": 0, "details": "Processing..."}
+        checkpoint = profiler = None
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job, state, done), daemon=True
+        )
+        heartbeat.start()
+        # Setup is inside the try too: a job whose file has gone missing must
+        # fail through the queue rather than kill the worker
+        try:
+            inspection = job["payload"]["inspection"]
+            cost = estimate_job_cost(inspection)
+            job_progress = JobProgress(
+                self.throughput_model, cost, inspection.get("page_content_bytes")
+            )
+
+            def progress_callback(stage, progress):
+                if stage != job_progress.stage:
+                    job_progress.start_stage(stage)
+                percent, _ = job_progress.update(progress)
+                state["progress"] = int(percent)
+                state["details"] = f"{stage.capitalize()}: {progress:.1f}% complete"
+
+            if CHECKPOINTS:
+                checkpoint = JobCheckpoint(job_id)
+                checkpoint.start(
+                    job["filepath"], filename=job_id, inspection=inspection
+                )
+
+            if job["payload"].get("profile"):
+                profiler = JobProfiler(job_id)
+
+            result = process_document(
+                job["filepath"],
+                self.output_folder,
+                progress_callback,
+                checkpoint,
+                self.similarity_index,
+                profiler,
+            )
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            failed = self.job_queue.fail(
+                job_id, self.worker_id, f"{type(e).__name__}: {e}"
+            )
+            # A retried attempt resumes from the checkpoint; a failed job won't
+            if failed and checkpoint is not None:
+                checkpoint.clear()
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+            if profiler is not None:
+                try:
+                    profiler.save()
+                except OSError as e:
+                    logger.error(f"Could not save the profile of {job_id}: {str(e)}")
+        result["profile_url"] = f"/profile/{job_id}" if profiler else None
+
+        self.job_queue.complete(job_id, self.worker_id, result)
+        if checkpoint is not None:
+            checkpoint.clear()
+        stage_seconds = {
+            "preprocess": result["preprocessing_time"],
+            "save": result["saving_time"],
+        }
+        # Resumed extraction took a fraction of the document's real time
+        if not result["resumed_pages"]:
+            stage_seconds["extract"] = result["extraction_time"]
+        self.throughput_model.record(cost, result["extracted_length"], stage_seconds)
+        logger.info(f"Job {job_id} complete in {result['total_time']:.3f} seconds")
+
+
+def _run_worker(queue_url, output_folder):
+    worker = QueueWorker(open_job_queue(queue_url), output_folder)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Process jobs from the shared queue independently of the web tier."
+    )
+    parser.add_argument("--queue", default=JOB_QUEUE_URL, help="JOB_QUEUE_URL")
+    parser.add_argument("--output", default=PROCESSED_FILE_FOLDER)
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args(argv)
+    if not args.queue:
+        parser.error("no job queue configured (set JOB_QUEUE_URL or pass --queue)")
+
+    download_nltk_resources()
+    if args.concurrency <= 1:
+        _run_worker(args.queue, args.output)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_worker, args=(args.queue, args.output), name=f"worker-{index}"
+        )
+        for index in range(args.concurrency)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    # Ctrl-C already reaches the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()